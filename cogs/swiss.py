@@ -20,31 +20,138 @@ Swiss Tournament (Button-Only, No Slash, No Subcommands)
 Requirements:
 - discord.py v2.x
 - aiosqlite
-- matplotlib (optional; used to render standings image; falls back to text)
+- Pillow (optional; preferred renderer for the standings image)
+- matplotlib (optional; used to render standings image when Pillow is missing; falls back to text)
 """
 
 from __future__ import annotations
 import asyncio
+import os
 import random
 import time
 import io
 import re
+import threading
+import unicodedata
 import datetime as dt
-from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple
+import functools
+import itertools
+import logging
+from collections import OrderedDict
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
 
 import aiosqlite
 import discord
 from discord.ext import commands
 
+try:
+    import matplotlib
+    from matplotlib import font_manager
+    from matplotlib.figure import Figure
+    matplotlib.rcParams["axes.unicode_minus"] = False
+except ImportError:  # 未安裝時積分表改輸出文字
+    matplotlib = font_manager = Figure = None
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:
+    Image = ImageDraw = ImageFont = None
+
+log = logging.getLogger(__name__)
+
 DB_PATH = "swiss.db"
+# WAL 下 synchronous=NORMAL 只在 checkpoint 時 fsync，大量小寫入（audit、比分）明顯較快；
+# 代價是斷電時可能遺失最後幾筆已 commit 的交易（資料庫本身不會損毀）
+# swiss_extras 另開連線寫同一個檔；多語句寫入一律 BEGIN IMMEDIATE 先拿寫鎖，搭配 busy_timeout 排隊而非 SQLITE_BUSY
+DB_PRAGMAS = """
+PRAGMA journal_mode=WAL;
+PRAGMA synchronous=NORMAL;
+PRAGMA wal_autocheckpoint=1000;
+PRAGMA mmap_size=268435456;
+PRAGMA temp_store=MEMORY;
+PRAGMA cache_size=-20000;
+PRAGMA busy_timeout=5000;
+PRAGMA foreign_keys=ON;
+"""
+# 讀取連線：不改 journal_mode，並設 query_only 防止誤寫
+DB_READ_PRAGMAS = """
+PRAGMA mmap_size=268435456;
+PRAGMA temp_store=MEMORY;
+PRAGMA cache_size=-20000;
+PRAGMA busy_timeout=5000;
+PRAGMA query_only=ON;
+"""
+DB_READERS = min(4, os.cpu_count() or 1)
+# sqlite3 每條連線的 prepared statement LRU 容量（預設 128）；本檔 SQL 加上各種欄位組合的 upsert 會超過
+DB_STMT_CACHE = 256
+# 記憶體快取存活秒數
+ORG_CACHE_TTL = 30
+STATUS_CACHE_TTL = 30
+BAN_CACHE_TTL = 10
+# 查無此人的 user id 記住多久，期間不再打 Discord API
+MEMBER_MISS_TTL = 30
+# 批量解析成員時同時在途的 API 查詢上限，避免一次灌爆 rate limit
+MEMBER_LOOKUP_CONCURRENCY = 10
+# 積分表列數不超過此值時直接送文字，不繪圖
+STANDINGS_TEXT_MAX_ROWS = 8
+# 積分表 PNG 快取筆數（以表格內容為 key，內容沒變就直接重用）
+STANDINGS_PNG_CACHE_SIZE = 64
+# 配對深度優先搜尋最多嘗試的步數；用完就放寬到允許重複對戰，避免人數多時卡住事件迴圈
+PAIR_SEARCH_STEPS = 20000
 
 # ---------- Constants ----------
 CLASS_LABELS = ["精靈", "皇家", "巫師", "龍族", "夜魔", "主教", "復仇者"]
+# 與 CLASS_LABELS 同序；用於按鈕 custom_id
+CLASS_SLUGS = ["elf", "royal", "witch", "dragon", "night", "bishop", "avenger"]
+_SLUG_LABEL = dict(zip(CLASS_SLUGS, CLASS_LABELS))
 
 # ---------- Data rows ----------
-@dataclass
-class PlayerRow:
+# Discord 使用者 ID（snowflake）
+_SNOWFLAKE_RE = re.compile(r"\d{15,20}")
+# 批量清單：整段即為 <@id> / <@!id> 或純 ID 的 token；分隔符為逗號與空白
+_MENTION_RE = re.compile(r"<@!?(\d{15,20})>")
+_ID_RE = re.compile(r"(\d{15,20})")
+_LIST_SEP_RE = re.compile(r"[,\s]+")
+
+# match_player_meta upsert：依要更新的欄位組合預先組好 SQL，呼叫時只查表
+_MPM_COLS = ("pick1", "pick2", "actual")
+_MPM_INSERT = (
+    "INSERT INTO match_player_meta(match_id, player_id, pick1, pick2, actual) VALUES(?,?,?,?,?) "
+)
+_MPM_UPSERT_SQL: Dict[Tuple[str, ...], str] = {
+    (): "INSERT OR IGNORE" + _MPM_INSERT[len("INSERT"):],
+}
+for _mask in range(1, 1 << len(_MPM_COLS)):
+    _cols = tuple(c for i, c in enumerate(_MPM_COLS) if _mask & (1 << i))
+    _MPM_UPSERT_SQL[_cols] = (
+        _MPM_INSERT + "ON CONFLICT(match_id, player_id) DO UPDATE SET "
+        + ", ".join(f"{c}=excluded.{c}" for c in _cols)
+    )
+del _mask, _cols
+
+# 多處共用的語句；同一字串才會命中 sqlite3 的 statement cache，集中在此避免各處寫法漂移
+_SQL_ADD_WIN = "UPDATE players SET score=score+3 WHERE id=?"
+_SQL_SET_PLAYER_DECKS = "UPDATE players SET deck1=?, deck2=?, actual_class=? WHERE id=?"
+_SQL_INSERT_BAN = "INSERT OR IGNORE INTO tournament_bans(tournament_id,user_id,reason,by_user_id,created_at) VALUES(?,?,?,?,?)"
+_SQL_INSERT_PLAYER = "INSERT OR IGNORE INTO players(tournament_id,user_id,display_name,active) VALUES(?,?,?,?)"
+_SQL_CLEAR_MATCH_META = "DELETE FROM match_player_meta WHERE match_id=?"
+
+# 使用者在某輪的對局與本局職業選擇；分兩段 UNION ALL 讓 p1/p2 各走自己的索引
+# 參數：?1=tournament_id ?2=user_id ?3=round_id
+_USER_ROUND_META_SQL = (
+    "SELECT p.id, m.id, mpm.pick1, mpm.pick2, mpm.actual, m.table_no "
+    "FROM players p JOIN matches m ON m.p1_id=p.id "
+    "LEFT JOIN match_player_meta mpm ON mpm.match_id=m.id AND mpm.player_id=p.id "
+    "WHERE p.tournament_id=?1 AND p.user_id=?2 AND m.round_id=?3 "
+    "UNION ALL "
+    "SELECT p.id, m.id, mpm.pick1, mpm.pick2, mpm.actual, m.table_no "
+    "FROM players p JOIN matches m ON m.p2_id=p.id "
+    "LEFT JOIN match_player_meta mpm ON mpm.match_id=m.id AND mpm.player_id=p.id "
+    "WHERE p.tournament_id=?1 AND p.user_id=?2 AND m.round_id=?3 "
+    "ORDER BY 6 LIMIT 1"
+)
+
+class PlayerRow(NamedTuple):
+    """players 表的一列；NamedTuple 以 _make 直接由查詢結果建立。"""
     id: int
     tournament_id: int
     user_id: int
@@ -53,8 +160,82 @@ class PlayerRow:
     score: float
 
 # ---------- Helpers ----------
-def chunk_text(s: str, limit: int = 1800) -> List[str]:
-    return [s[i:i + limit] for i in range(0, len(s), limit)]
+@functools.lru_cache(maxsize=1)
+def _cjk_font_path() -> Optional[str]:
+    """找一個可顯示中文的字型檔；findfont 每次都掃字型快取，結果只算一次。"""
+    env_path = os.getenv("SWISS_CJK_FONT")
+    if env_path and os.path.isfile(env_path):
+        return env_path
+    if font_manager is None:
+        return None
+    candidates = [
+        "Microsoft JhengHei", "Microsoft YaHei", "SimHei", "PMingLiU", "MingLiU",
+        "PingFang TC", "PingFang SC", "Hiragino Sans",
+        "Noto Sans CJK TC", "Noto Sans CJK SC", "Noto Sans CJK JP",
+        "Noto Sans TC", "Source Han Sans TW", "Source Han Sans SC", "Source Han Sans JP",
+    ]
+    for name in candidates:
+        try:
+            path = font_manager.findfont(name, fallback_to_default=False)
+            if os.path.isfile(path):
+                return path
+        except Exception:
+            continue
+    return None
+
+@functools.lru_cache(maxsize=1)
+def _pick_cjk_font() -> "font_manager.FontProperties":
+    path = _cjk_font_path()
+    return font_manager.FontProperties(fname=path) if path else font_manager.FontProperties()
+
+@functools.lru_cache(maxsize=1)
+def _pil_cjk_font() -> Optional["ImageFont.FreeTypeFont"]:
+    """Pillow 用的中文字型；找不到字型檔時回 None（預設點陣字型畫不出中文）。"""
+    path = _cjk_font_path()
+    if ImageFont is None or not path:
+        return None
+    try:
+        return ImageFont.truetype(path, 18)
+    except OSError:
+        return None
+
+def _text_width(s: str) -> int:
+    """等寬字型下的顯示寬度：全形（中日韓）字元算 2 格。"""
+    return sum(2 if unicodedata.east_asian_width(ch) in ("W", "F") else 1 for ch in s)
+
+def _format_text_table(headers: List[str], table: List[list]) -> str:
+    """以空白補齊欄寬的純文字表格（放進 code block 用）。"""
+    cells = [[str(x) for x in headers]] + [[str(x) for x in row] for row in table]
+    widths = [max(_text_width(r[c]) for r in cells) for c in range(len(headers))]
+    return "\n".join(
+        "  ".join(text + " " * (widths[c] - _text_width(text)) for c, text in enumerate(r)).rstrip()
+        for r in cells
+    )
+
+def chunk_text(s: str, limit: int = 1800) -> Iterator[str]:
+    """逐段產生；呼叫端多半只走一次，不必先切出整份 list。"""
+    return (s[i:i + limit] for i in range(0, len(s), limit))
+
+class _Reuse:
+    """
+    以 `async with` 借用共用連線，離開時不關閉。
+    區塊期間持有鎖，避免別的 handler 的 commit/rollback 插進本區塊的語句之間。
+    """
+    def __init__(self, conn: aiosqlite.Connection, lock: asyncio.Lock):
+        self._conn = conn
+        self._lock = lock
+
+    async def __aenter__(self) -> aiosqlite.Connection:
+        await self._lock.acquire()
+        return self._conn
+
+    async def __aexit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is not None:
+                # 與舊的「關閉連線即丟棄未提交變更」行為一致
+                await self._conn.rollback()
+        finally:
+            self._lock.release()
 
 # ---------- Cog ----------
 class SwissAll(commands.Cog):
@@ -62,19 +243,105 @@ class SwissAll(commands.Cog):
         self.bot = bot
         self._ready = False
         self._lock = asyncio.Lock()
+        # 長連線：setup_db 開啟一次，之後所有 db() 區塊共用
+        self._conn: Optional[aiosqlite.Connection] = None
+        self._db_lock = asyncio.Lock()
+        # 唯讀連線池（WAL 下可與寫入並行）；每條各自一把鎖，db_read() 輪流借出
+        self._readers: List[Tuple[aiosqlite.Connection, asyncio.Lock]] = []
+        self._reader_rr = 0
+        # guild_id -> 最近一次 !swiss 控制訊息的 message_id（同頻道再次呼叫時改為編輯）
+        self._panel_msg: Dict[int, int] = {}
+        # tid -> (organizer_id, 寫入時間)；短 TTL，避免 DB 被外部改動後長期不一致
+        self._org_cache: Dict[int, Tuple[Optional[int], float]] = {}
+        # tid -> (status, 寫入時間)；set_status 寫入時同步更新，TTL 兜住 swiss_extras 另開連線的改動（如刪賽）
+        self._status_cache: Dict[int, Tuple[str, float]] = {}
+        # tid -> (封禁 user_id 集合, 寫入時間)；本 cog 的封禁/解禁會直接作廢
+        self._ban_cache: Dict[int, Tuple[frozenset, float]] = {}
+        # (guild_id, user_id) -> 查無成員的時間；打錯的 ID 在 MEMBER_MISS_TTL 內直接回 None
+        self._member_miss: Dict[Tuple[int, int], float] = {}
+        # guild_id -> {casefold 後的 display_name / name: {member_id, ...}}；首次查詢時建立，成員異動時增刪個別 id
+        # 同一 key 可能對到多人（如 Bob / bob），因此存集合，離開或改名只移除自己那一個
+        self._name_index: Dict[int, Dict[str, set]] = {}
+        # (View 類別名, tid) -> 重複使用的無 timeout 面板實例（按鈕只依 self.tid 動作，沒有其他狀態）
+        self._tid_views: Dict[Tuple[str, int], discord.ui.View] = {}
+        # guild_id -> BootView；同上，只依 guild_id 動作，每個伺服器重複使用一個
+        self._boot_views: Dict[int, discord.ui.View] = {}
+        # (tid, rid) -> 該輪三個回報面板；重新登錄（cog_load）與重發面板（同輪重抽）共用同一組實例
+        self._round_view_cache: Dict[Tuple[int, int], Tuple[discord.ui.View, ...]] = {}
+        # rid -> {pid: display_name}；該輪第一次查名字時建立，close_round / 重抽時清除
+        self._name_cache: Dict[int, Dict[int, str]] = {}
+        # audit_logs 寫入佇列；cog_load 啟動 _audit_flusher 消化
+        self._audit_q: asyncio.Queue = asyncio.Queue()
+        self._audit_task: Optional[asyncio.Task] = None
+        # 背景收尾 task；保留強參照，完成後自動移除
+        self._bg_tasks: set = set()
+        # 積分表圖：第一次繪製時建立，之後 clear 重畫，不再每次新建 Figure
+        self._fig = None
+        self._ax = None
+        # 表格內容(tuple) -> PNG bytes；LRU，最舊的先丟
+        self._png_cache: "OrderedDict[tuple, bytes]" = OrderedDict()
+        # 繪製在 worker thread 進行；共用同一個 Figure / 字型物件，同時只允許一個 render
+        self._render_lock = threading.Lock()
 
     # -------------- DB --------------
     def db(self):
-        # return async context manager (aiosqlite.connect)
-        return aiosqlite.connect(DB_PATH)
+        # return async context manager；setup_db 之後借用共用長連線，之前退回一次性連線
+        if self._conn is None:
+            return aiosqlite.connect(DB_PATH, cached_statements=DB_STMT_CACHE)
+        return _Reuse(self._conn, self._db_lock)
+
+    # 寫入（含需要讀自己剛寫入資料的區塊）一律走單一寫入連線
+    db_write = db
+
+    def db_read(self):
+        """純讀取用；讀取池尚未建立時退回 db()。"""
+        if not self._readers:
+            return self.db()
+        conn, lock = self._readers[self._reader_rr % len(self._readers)]
+        self._reader_rr += 1
+        return _Reuse(conn, lock)
+
+    async def cog_load(self):
+        await self.setup_db()
+        self._audit_task = asyncio.create_task(self._audit_flusher())
+        # 回報面板的 custom_id 帶 tid/rid；重啟後把進行中輪次的面板重新掛回，舊訊息按鈕照常可用
+        async with self.db() as conn:
+            ongoing = await conn.execute_fetchall("SELECT tournament_id, id FROM rounds WHERE status='ongoing'")
+        for tid, rid in ongoing:
+            for view in self._round_views(tid, rid):
+                self.bot.add_view(view)
+
+    async def cog_unload(self):
+        if self._audit_task is not None:
+            self._audit_task.cancel()
+            self._audit_task = None
+        # 關連線前把佇列裡還沒寫的 audit 一次補寫
+        pending = []
+        while not self._audit_q.empty():
+            pending.append(self._audit_q.get_nowait())
+        if pending and self._conn is not None:
+            await self._write_audits(pending)
+        readers, self._readers = self._readers, []
+        for rconn, _lock in readers:
+            await rconn.close()
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._ready = False
+            try:
+                await conn.execute("PRAGMA optimize")
+            except Exception:
+                log.exception("PRAGMA optimize failed")
+            await conn.close()
 
     async def setup_db(self):
         if self._ready:
             return
+        if self._conn is None:
+            self._conn = await aiosqlite.connect(DB_PATH, cached_statements=DB_STMT_CACHE)
+            await self._conn.executescript(DB_PRAGMAS)
         async with self.db() as conn:
             await conn.executescript(
                 """
-                PRAGMA journal_mode=WAL;
                 CREATE TABLE IF NOT EXISTS tournaments (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     guild_id INTEGER NOT NULL,
@@ -113,8 +380,16 @@ class SwissAll(commands.Cog):
                     winner_player_id INTEGER,
                     notes TEXT
                 );
-                CREATE INDEX IF NOT EXISTS idx_matches_round ON matches(round_id);
-                CREATE INDEX IF NOT EXISTS idx_players_tid ON players(tournament_id);
+                -- 唯一索引是 partial（table_no > 0），綁參數查桌號時規劃器用不上，另建一條一般索引；
+                -- 它以 round_id 開頭，原本單欄的 idx_matches_round 已多餘，移除以省寫入成本
+                CREATE INDEX IF NOT EXISTS idx_matches_round_table ON matches(round_id, table_no);
+                DROP INDEX IF EXISTS idx_matches_round;
+                -- 依玩家找本輪對局：p1/p2 各一個索引，查詢以 UNION ALL 分別走索引
+                CREATE INDEX IF NOT EXISTS idx_matches_round_p1 ON matches(round_id, p1_id) WHERE p1_id IS NOT NULL;
+                CREATE INDEX IF NOT EXISTS idx_matches_round_p2 ON matches(round_id, p2_id) WHERE p2_id IS NOT NULL;
+                -- (tournament_id, active, score) 的最左欄已涵蓋只依 tournament_id 的查詢，舊的單欄索引只會拖慢寫入
+                CREATE INDEX IF NOT EXISTS idx_players_tid_active ON players(tournament_id, active, score);
+                DROP INDEX IF EXISTS idx_players_tid;
 
                 -- Per-match per-player class picks
                 CREATE TABLE IF NOT EXISTS match_player_meta (
@@ -126,6 +401,11 @@ class SwissAll(commands.Cog):
                     actual TEXT,
                     UNIQUE(match_id, player_id)
                 );
+                -- 刪對局時一併清掉其選職紀錄（舊表沒有外鍵，改用 trigger；swiss_extras 的刪賽也適用）
+                CREATE TRIGGER IF NOT EXISTS trg_matches_delete_meta AFTER DELETE ON matches
+                BEGIN
+                    DELETE FROM match_player_meta WHERE match_id = OLD.id;
+                END;
 
                 -- Ban list
                 CREATE TABLE IF NOT EXISTS tournament_bans (
@@ -147,121 +427,302 @@ class SwissAll(commands.Cog):
                     payload TEXT,
                     created_at INTEGER NOT NULL
                 );
+                CREATE TABLE IF NOT EXISTS schema_meta (
+                    key TEXT PRIMARY KEY,
+                    val TEXT
+                );
                 """
             )
+            # 同輪桌號唯一（換桌時暫用負數，不受限制）；舊資料若已有重複就略過
+            try:
+                await conn.execute(
+                    "CREATE UNIQUE INDEX IF NOT EXISTS uniq_matches_round_table ON matches(round_id, table_no) WHERE table_no > 0"
+                )
+            except Exception:
+                pass
+            async with conn.execute("SELECT val FROM schema_meta WHERE key='dedupe_done'") as cur:
+                dedupe_done = await cur.fetchone() is not None
+            if dedupe_done:
+                await self._open_readers()
+                self._ready = True
+                return
 
-            # 清掉同賽事同 user_id 的重複報名，只保留最早的一筆
+            # 舊資料庫才需要：清掉同賽事同 user_id 的重複報名，只保留最早的一筆
+            # 與下方建索引同一交易，只在最後 commit 一次
             try:
-                await conn.executescript("""
-                DELETE FROM players
-                WHERE rowid NOT IN (
-                    SELECT MIN(rowid) FROM players GROUP BY tournament_id, user_id
-                );
-                """)
+                await conn.execute(
+                    "DELETE FROM players WHERE rowid NOT IN ("
+                    "SELECT MIN(rowid) FROM players GROUP BY tournament_id, user_id)"
+                )
             except Exception:
                 pass
-            # 建立唯一索引避免重複報名
+            # 建立唯一索引避免重複報名；成功後記下旗標，之後啟動不再重掃 players
             try:
                 await conn.execute(
                     "CREATE UNIQUE INDEX IF NOT EXISTS uniq_players_tid_uid ON players(tournament_id, user_id)"
                 )
+                await conn.execute("INSERT OR REPLACE INTO schema_meta(key, val) VALUES('dedupe_done', '1')")
             except Exception:
                 pass
 
             await conn.commit()
+        await self._open_readers()
         self._ready = True
 
+    async def _open_readers(self):
+        # 需在寫入連線建好 schema、切到 WAL 之後再開
+        while len(self._readers) < DB_READERS:
+            rconn = await aiosqlite.connect(DB_PATH, cached_statements=DB_STMT_CACHE)
+            await rconn.executescript(DB_READ_PRAGMAS)
+            self._readers.append((rconn, asyncio.Lock()))
+
     # -------------- Small utils --------------
-    async def _audit(self, tid: int, actor_uid: int, action: str, payload: str = ""):
-        async with self.db() as conn:
-            await conn.execute(
-                "INSERT INTO audit_logs(tournament_id,action,actor_user_id,payload,created_at) VALUES(?,?,?,?,?)",
-                (tid, action, actor_uid, payload, int(time.time()))
-            )
-            await conn.commit()
+    def _audit(self, tid: int, actor_uid: int, action: str, payload: str = ""):
+        """排入佇列即返回；由 _audit_flusher 在背景批次寫入，不拖慢按鈕回應。"""
+        self._audit_q.put_nowait((tid, action, actor_uid, payload, int(time.time())))
+
+    async def _audit_flusher(self):
+        while True:
+            batch = [await self._audit_q.get()]
+            await asyncio.sleep(0.1)  # 稍等讓同一時間的事件併成一批
+            while len(batch) < 256 and not self._audit_q.empty():
+                batch.append(self._audit_q.get_nowait())
+            await self._write_audits(batch)
+
+    async def _write_audits(self, batch: List[tuple]):
+        try:
+            async with self.db_write() as conn:
+                await conn.execute("BEGIN IMMEDIATE")
+                await conn.executemany(
+                    "INSERT INTO audit_logs(tournament_id,action,actor_user_id,payload,created_at) VALUES(?,?,?,?,?)",
+                    batch
+                )
+                await conn.commit()
+        except Exception:
+            log.exception("audit flush failed (%d rows)", len(batch))
 
     async def _is_organizer_user(self, tid: int, user: discord.abc.User) -> bool:
-        org = await self.get_organizer(tid)
-        try:
-            # user 若是 Member 就有 guild 與 guild_permissions
-            guild = getattr(user, "guild", None)
-            is_owner = bool(guild and guild.owner_id == user.id)
-            return (user.id == org) or is_owner or user.guild_permissions.manage_guild
-        except AttributeError:
-            # DM 或非 Member 的情況；只允許 organizer
-            return (user.id == org)
+        # 伺服器擁有者 / 管理權限只看 Member 本身，先判斷；符合就不必查主辦者
+        guild = getattr(user, "guild", None)
+        if guild is not None and (guild.owner_id == user.id or user.guild_permissions.manage_guild):
+            return True
+        # 其餘（一般成員、DM 的 User）只認主辦者本人
+        return user.id == await self.get_organizer(tid)
 
 
     async def _resolve_member(self, guild: discord.Guild, token: str) -> Optional[discord.Member]:
         """Accepts @mention, <@!id>, id, or name#discrim/name."""
         token = token.strip()
-        m = re.search(r"\d{15,20}", token)
+        m = _SNOWFLAKE_RE.search(token)
         if m:
             uid = int(m.group(0))
-            member = guild.get_member(uid) or (await guild.fetch_member(uid) if guild.chunked or guild.me else None)
-            return member
-        cand = guild.get_member_named(token)
-        if cand: return cand
-        # fallback: case-insensitive display_name match (first)
-        token_lower = token.lower()
-        for mm in guild.members:
-            if mm.display_name.lower() == token_lower or mm.name.lower() == token_lower:
-                return mm
-        return None
+            member = guild.get_member(uid)
+            if member or guild.chunked:
+                # 已 chunk 的伺服器快取即完整名單，快取沒有就是不在伺服器
+                return member
+            return await self._query_member(guild, uid)
+        # case-insensitive display_name / name：先查索引（O(1)）
+        ids = self._guild_name_index(guild).get(token.casefold())
+        cands = [mm for mm in map(guild.get_member, sorted(ids or ())) if mm]
+        # 大小寫完全相同者優先（Bob / bob 並存時，輸入 Bob 不可解析成 bob）
+        exact = [mm for mm in cands if mm.display_name == token or mm.name == token]
+        if exact:
+            return exact[0]
+        if len(cands) == 1:
+            return cands[0]
+        # fallback: name#discrim / global_name 等交給 discord.py（逐一掃描）
+        # 多位只差大小寫且都不完全相符時，也先讓 discord.py 判斷，仍無結果才取 id 最小者（結果固定）
+        return guild.get_member_named(token) or (cands[0] if cands else None)
+
+    async def _query_member(self, guild: discord.Guild, uid: int) -> Optional[discord.Member]:
+        """快取沒有的 ID：先走 gateway 查詢（順便寫回快取），不行才打 REST。"""
+        key = (guild.id, uid)
+        hit = self._member_miss.get(key)
+        if hit and time.monotonic() - hit < MEMBER_MISS_TTL:
+            return None
+        try:
+            found = await guild.query_members(user_ids=[uid], limit=1, cache=True)
+            if found:
+                return found[0]
+        except (discord.ClientException, asyncio.TimeoutError):
+            # 未開 members intent 或 gateway 逾時
+            pass
+        try:
+            return await guild.fetch_member(uid)
+        except discord.NotFound:
+            self._member_miss[key] = time.monotonic()
+            return None
+
+    def _guild_name_index(self, guild: discord.Guild) -> Dict[str, set]:
+        idx = self._name_index.get(guild.id)
+        if idx is None:
+            idx = {}
+            for mm in guild.members:
+                self._index_member(idx, mm)
+            self._name_index[guild.id] = idx
+        return idx
+
+    @staticmethod
+    def _index_member(idx: Dict[str, set], member: discord.Member):
+        for key in (member.display_name.casefold(), member.name.casefold()):
+            idx.setdefault(key, set()).add(member.id)
+
+    @staticmethod
+    def _unindex_member(idx: Dict[str, set], member: discord.Member):
+        # 只移除這位成員；同 key 的其他人保留
+        for key in (member.display_name.casefold(), member.name.casefold()):
+            ids = idx.get(key)
+            if ids is not None:
+                ids.discard(member.id)
+                if not ids:
+                    del idx[key]
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member: discord.Member):
+        idx = self._name_index.get(member.guild.id)
+        if idx is not None:
+            self._index_member(idx, member)
+
+    @commands.Cog.listener()
+    async def on_member_update(self, before: discord.Member, after: discord.Member):
+        if before.display_name != after.display_name or before.name != after.name:
+            idx = self._name_index.get(after.guild.id)
+            if idx is not None:
+                self._unindex_member(idx, before)
+                self._index_member(idx, after)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member: discord.Member):
+        idx = self._name_index.get(member.guild.id)
+        if idx is not None:
+            self._unindex_member(idx, member)
+
+    @commands.Cog.listener()
+    async def on_user_update(self, before: discord.User, after: discord.User):
+        # 使用者名稱改動不帶 guild，直接全部作廢
+        if before.name != after.name or before.display_name != after.display_name:
+            self._name_index.clear()
 
     async def _player_pid_by_user(self, tid: int, user_id: int) -> Optional[int]:
-        async with self.db() as conn:
+        async with self.db_read() as conn:
             async with conn.execute("SELECT id FROM players WHERE tournament_id=? AND user_id=?", (tid, user_id)) as cur:
                 r = await cur.fetchone()
                 return int(r[0]) if r else None
 
-    async def _find_match_by_pid(self, rid: int, pid: int) -> Optional[Tuple[int,int,Optional[int],Optional[int],Optional[str]]]:
+    async def _names_by_pid(self, pids: List[Optional[int]]) -> Dict[int, str]:
+        """一次查多位選手名稱：{pid: display_name}；None 與查無者不會出現在結果中。"""
+        # 去重：同一人可能在多桌（或 p1/p2 同人）出現，IN 清單不必重複綁定
+        pids = list(dict.fromkeys(p for p in pids if p is not None))
+        if not pids:
+            return {}
+        async with self.db_read() as conn:
+            return dict(await conn.execute_fetchall(
+                f"SELECT id, display_name FROM players WHERE id IN ({','.join('?' * len(pids))})",
+                pids,
+            ))
+
+    async def _round_names(self, tid: int, rid: int, pids: List[Optional[int]]) -> Dict[int, str]:
+        """同 _names_by_pid，但在同一輪內以記憶體快取回答；快取缺的才回頭查 DB。"""
+        names = self._name_cache.get(rid)
+        if names is None:
+            async with self.db_read() as conn:
+                names = self._name_cache[rid] = dict(await conn.execute_fetchall(
+                    "SELECT id, display_name FROM players WHERE tournament_id=?", (tid,)
+                ))
+        missing = [p for p in pids if p is not None and p not in names]
+        if missing:
+            names.update(await self._names_by_pid(missing))
+        return {p: names[p] for p in pids if p in names}
+
+    async def _users_round_matches(self, tid: int, rid: int, user_ids: List[int]):
         """
-        依 players.id（pid）取得本輪該玩家的對局：
-        回傳 (match_id, table_no, p1_id, p2_id, result)；找不到回傳 None
+        一次查多位使用者在本輪的 pid 與對局：
+        回傳 {user_id: (pid, (match_id, table_no, p1_id, p2_id, result) 或 None)}；不在名單者不出現
         """
-        async with self.db() as conn:
-            async with conn.execute(
-                "SELECT id, table_no, p1_id, p2_id, result "
-                "FROM matches WHERE round_id=? AND (p1_id=? OR p2_id=?) "
-                "ORDER BY table_no LIMIT 1",
-                (rid, pid, pid)
-            ) as cur:
-                r = await cur.fetchone()
-        if not r:
-            return None
-        return (r[0], r[1], r[2], r[3], r[4])
+        if not user_ids:
+            return {}
+        async with self.db_read() as conn:
+            rows = await conn.execute_fetchall(
+                "SELECT p.user_id, p.id, m.id, m.table_no, m.p1_id, m.p2_id, m.result "
+                "FROM players p LEFT JOIN matches m ON m.round_id=? AND (m.p1_id=p.id OR m.p2_id=p.id) "
+                f"WHERE p.tournament_id=? AND p.user_id IN ({','.join('?' * len(user_ids))}) "
+                "ORDER BY m.table_no DESC",
+                (rid, tid, *user_ids)
+            )
+        # 同一人若有多桌，取桌號最小者（DESC 排序，dict 保留最後寫入的一筆）
+        return {r[0]: (r[1], tuple(r[2:]) if r[2] is not None else None) for r in rows}
 
     async def _find_user_round_match(self, tid: int, rid: int, user_id: int):
         """
         回傳 (player_pid, (mid, table_no, p1_id, p2_id, result, winner_player_id))；找不到則回傳 None
         """
-        async with self.db() as conn:
+        async with self.db_read() as conn:
             async with conn.execute(
-                "SELECT id FROM players WHERE tournament_id=? AND user_id=?",
-                (tid, user_id)
+                "SELECT p.id, m.id, m.table_no, m.p1_id, m.p2_id, m.result, m.winner_player_id "
+                "FROM players p JOIN matches m ON m.p1_id=p.id "
+                "WHERE p.tournament_id=? AND p.user_id=? AND m.round_id=? "
+                "UNION ALL "
+                "SELECT p.id, m.id, m.table_no, m.p1_id, m.p2_id, m.result, m.winner_player_id "
+                "FROM players p JOIN matches m ON m.p2_id=p.id "
+                "WHERE p.tournament_id=? AND p.user_id=? AND m.round_id=? "
+                "ORDER BY 3 LIMIT 1",
+                (tid, user_id, rid, tid, user_id, rid)
             ) as cur:
                 r = await cur.fetchone()
-            if not r:
-                return None
-            pid = r[0]
-            async with conn.execute(
-                "SELECT id, table_no, p1_id, p2_id, result, winner_player_id "
-                "FROM matches WHERE round_id=? AND (p1_id=? OR p2_id=?) "
-                "ORDER BY table_no LIMIT 1",
-                (rid, pid, pid)
-            ) as cur2:
-                mrow = await cur2.fetchone()
-        return (pid, mrow) if mrow else None
+        return (r[0], tuple(r[1:])) if r else None
+
+    async def _find_user_round_meta(self, tid: int, rid: int, user_id: int):
+        """
+        同上，但一併帶出本局的職業選擇：
+        回傳 (player_pid, match_id, pick1, pick2, actual)；找不到則回傳 None
+        """
+        async with self.db_read() as conn:
+            async with conn.execute(_USER_ROUND_META_SQL, (tid, user_id, rid)) as cur:
+                r = await cur.fetchone()
+        return tuple(r[:5]) if r else None
+
+    async def _apply_pick(self, tid: int, rid: int, user_id: int, label: str) -> str:
+        """
+        選一個使用牌組：查本局選擇、檢查、寫 meta 與 players 全在同一交易。
+        回傳 'nomatch' | 'dup' | 'full' | 'pick1' | 'pick2'
+        """
+        async with self.db_write() as conn:
+            await conn.execute("BEGIN IMMEDIATE")
+            async with conn.execute(_USER_ROUND_META_SQL, (tid, user_id, rid)) as cur:
+                r = await cur.fetchone()
+            if r is None:
+                status = "nomatch"
+            else:
+                pid, mid, p1, p2, actual = r[:5]
+                if label in (p1, p2):
+                    status = "dup"
+                elif p1 is None:
+                    status, p1 = "pick1", label
+                elif p2 is None:
+                    status, p2 = "pick2", label
+                else:
+                    status = "full"
+            if status not in ("pick1", "pick2"):
+                await conn.rollback()
+                return status
+            await conn.execute(
+                _MPM_UPSERT_SQL[(status,)],
+                (mid, pid, p1, p2, actual)
+            )
+            await conn.execute(
+                _SQL_SET_PLAYER_DECKS,
+                (p1, p2, actual, pid)
+            )
+            await conn.commit()
+        return status
     
     async def render_roster_text(self, tid: int) -> str:
         """組出完整名單文字（含 active 標記、分數與 uid）。"""
         players = await self.fetch_players(tid, active_only=False)
-        lines = []
-        for p in players:
-            tag = "✅" if p.active else "❌"
-            lines.append(f"{tag} {p.display_name} (uid={p.user_id}) 分數={p.score}")
-        return "\n".join(lines) if lines else "（目前沒有人）"
+        if not players:
+            return "（目前沒有人）"
+        fmt = "%s %s (uid=%d) 分數=%s".__mod__
+        return "\n".join([fmt(("✅" if p.active else "❌", p.display_name, p.user_id, p.score)) for p in players])
 
     async def _open_roster_safely(self, itx: discord.Interaction, tid: int):
         """名單 ≤3800 chars → 開 Modal；否則以附件+Embed 分頁回覆（ephemeral）。"""
@@ -276,10 +737,11 @@ class SwissAll(commands.Cog):
         buf.seek(0)
         file = discord.File(buf, filename=f"roster_{tid}.txt")
 
-        pages = chunk_text(text, limit=1800)  # 你已有 chunk_text 工具
+        page_len = 1800  # 分頁與頁數共用同一個上限，避免「第 i/total 頁」對不上
+        pages = chunk_text(text, limit=page_len)  # 你已有 chunk_text 工具
         embeds: list[discord.Embed] = []
-        total = len(pages)
-        for i, chunk in enumerate(pages[:10], 1):  # 安全起見：最多 10 個 embed
+        total = -(-len(text) // page_len)
+        for i, chunk in enumerate(itertools.islice(pages, 10), 1):  # 安全起見：最多 10 個 embed
             em = discord.Embed(title=f"名單（第 {i}/{total} 頁）", description=chunk)
             embeds.append(em)
 
@@ -294,17 +756,19 @@ class SwissAll(commands.Cog):
     async def create_tournament(self, guild_id: int, organizer_id: int, name: Optional[str]) -> int:
         name = name or dt.date.today().isoformat()
         async with self.db() as conn:
-            await conn.execute(
-                "INSERT INTO tournaments(guild_id,name,status,organizer_id,created_at) VALUES(?,?,?,?,?)",
+            async with conn.execute(
+                "INSERT INTO tournaments(guild_id,name,status,organizer_id,created_at) VALUES(?,?,?,?,?) RETURNING id",
                 (guild_id, name, "register", organizer_id, int(time.time())),
-            )
-            async with conn.execute("SELECT last_insert_rowid()") as cur:
+            ) as cur:
                 (tid,) = await cur.fetchone()
             await conn.commit()
-            return int(tid)
+        tid = int(tid)
+        self._org_cache[tid] = (organizer_id, time.monotonic())
+        self._status_cache[tid] = ("register", time.monotonic())
+        return tid
 
     async def guild_latest_tid(self, guild_id: int) -> Optional[int]:
-        async with self.db() as conn:
+        async with self.db_read() as conn:
             async with conn.execute(
                 "SELECT id FROM tournaments WHERE guild_id=? ORDER BY id DESC LIMIT 1",
                 (guild_id,),
@@ -313,32 +777,67 @@ class SwissAll(commands.Cog):
                 return r[0] if r else None
 
     async def tour_status(self, tid: int) -> str:
-        async with self.db() as conn:
+        hit = self._status_cache.get(tid)
+        if hit and time.monotonic() - hit[1] < STATUS_CACHE_TTL:
+            return hit[0]
+        async with self.db_read() as conn:
             async with conn.execute("SELECT status FROM tournaments WHERE id=?", (tid,)) as cur:
                 r = await cur.fetchone()
-                return r[0] if r else "init"
+        if not r:
+            return "init"
+        self._status_cache[tid] = (r[0], time.monotonic())
+        return r[0]
 
     async def set_status(self, tid: int, status: str):
         async with self.db() as conn:
             await conn.execute("UPDATE tournaments SET status=? WHERE id=?", (status, tid))
             await conn.commit()
+        self._status_cache[tid] = (status, time.monotonic())
 
     async def get_organizer(self, tid: int) -> Optional[int]:
-        async with self.db() as conn:
+        hit = self._org_cache.get(tid)
+        if hit and time.monotonic() - hit[1] < ORG_CACHE_TTL:
+            return hit[0]
+        async with self.db_read() as conn:
             async with conn.execute("SELECT organizer_id FROM tournaments WHERE id=?", (tid,)) as cur:
                 r = await cur.fetchone()
-                return r[0] if r else None
+        if not r:
+            return None
+        self._org_cache[tid] = (r[0], time.monotonic())
+        return r[0]
+
+    async def _banned_uids(self, tid: int) -> frozenset:
+        hit = self._ban_cache.get(tid)
+        if hit and time.monotonic() - hit[1] < BAN_CACHE_TTL:
+            return hit[0]
+        async with self.db_read() as conn:
+            rows = await conn.execute_fetchall("SELECT user_id FROM tournament_bans WHERE tournament_id=?", (tid,))
+        uids = frozenset(r[0] for r in rows)
+        self._ban_cache[tid] = (uids, time.monotonic())
+        return uids
+
+    def _tid_view(self, cls, tid: int) -> discord.ui.View:
+        key = (cls.__name__, tid)
+        view = self._tid_views.get(key)
+        if view is None:
+            view = self._tid_views[key] = cls(self, tid)
+        return view
+
+    def _forget_tournament(self, tid: int):
+        for key in [k for k in self._tid_views if k[1] == tid]:
+            self._tid_views.pop(key).stop()
+        for key in [k for k in self._round_view_cache if k[0] == tid]:
+            for view in self._round_view_cache.pop(key):
+                view.stop()
+        self._org_cache.pop(tid, None)
+        self._status_cache.pop(tid, None)
+        self._ban_cache.pop(tid, None)
 
     async def add_player(self, tid: int, member: discord.abc.User, active: int = 1) -> str:
         """return 'banned' | 'new' | 'reactivated' | 'already'"""
+        if member.id in await self._banned_uids(tid):
+            return "banned"
         async with self.db() as conn:
-            # ban check
-            async with conn.execute(
-                "SELECT 1 FROM tournament_bans WHERE tournament_id=? AND user_id=?",
-                (tid, member.id)
-            ) as cur:
-                if await cur.fetchone():
-                    return "banned"
             # try existing
             async with conn.execute(
                 "SELECT id,active FROM players WHERE tournament_id=? AND user_id=?",
@@ -353,51 +852,51 @@ class SwissAll(commands.Cog):
                 await conn.commit()
                 return "reactivated"
             # new
+            name = getattr(member, "display_name", None) or getattr(member, "name", None) or str(member.id)
             await conn.execute(
-                "INSERT OR IGNORE INTO players(tournament_id,user_id,display_name,active) VALUES(?,?,?,?)",
-                (tid, member.id, getattr(member, "display_name", getattr(member, "name", str(member.id))), active),
+                _SQL_INSERT_PLAYER,
+                (tid, member.id, name, active),
             )
             await conn.commit()
             return "new"
 
     async def mark_drop(self, tid: int, user_id: int):
         async with self.db() as conn:
-            await conn.execute(
-                "UPDATE players SET active=0 WHERE tournament_id=? AND user_id=?",
-                (tid, user_id),
-            )
+            await self._mark_drop_rows(conn, tid, [user_id])
             await conn.commit()
 
+    @staticmethod
+    async def _mark_drop_rows(conn: aiosqlite.Connection, tid: int, user_ids: List[int]):
+        """在呼叫端的連線/交易內把多位設為退賽（不 commit）。"""
+        await conn.executemany(
+            "UPDATE players SET active=0 WHERE tournament_id=? AND user_id=?",
+            [(tid, uid) for uid in user_ids],
+        )
+
     async def fetch_players(self, tid: int, active_only=True) -> List[PlayerRow]:
         q = "SELECT id,tournament_id,user_id,display_name,active,score FROM players WHERE tournament_id=?"
         if active_only:
             q += " AND active=1"
-        async with self.db() as conn:
+        async with self.db_read() as conn:
             async with conn.execute(q, (tid,)) as cur:
                 rows = await cur.fetchall()
-                return [PlayerRow(*r) for r in rows]
+                return list(map(PlayerRow._make, rows))
 
     async def create_round(self, tid: int) -> int:
         async with self.db() as conn:
+            # 輪次編號與插入合成一句，順便取回 id
             async with conn.execute(
-                "SELECT COALESCE(MAX(round_no),0)+1 FROM rounds WHERE tournament_id=?",
-                (tid,),
-            ) as cur:
-                (rno,) = await cur.fetchone()
-            await conn.execute(
-                "INSERT INTO rounds(tournament_id,round_no,status,created_at) VALUES(?,?,?,?)",
-                (tid, rno, "ongoing", int(time.time()))
-            )
-            await conn.commit()
-            async with conn.execute(
-                "SELECT id FROM rounds WHERE tournament_id=? AND round_no=?",
-                (tid, rno),
+                "INSERT INTO rounds(tournament_id,round_no,status,created_at) "
+                "SELECT ?, COALESCE(MAX(round_no),0)+1, 'ongoing', ? FROM rounds WHERE tournament_id=? "
+                "RETURNING id",
+                (tid, int(time.time()), tid)
             ) as cur:
                 (rid,) = await cur.fetchone()
-                return rid
+            await conn.commit()
+            return rid
 
     async def current_round(self, tid: int) -> Optional[Tuple[int, int, str]]:
-        async with self.db() as conn:
+        async with self.db_read() as conn:
             async with conn.execute(
                 "SELECT id,round_no,status FROM rounds WHERE tournament_id=? ORDER BY round_no DESC LIMIT 1",
                 (tid,),
@@ -405,145 +904,213 @@ class SwissAll(commands.Cog):
                 r = await cur.fetchone()
                 return (r[0], r[1], r[2]) if r else None
 
-    async def close_round(self, rid: int):
+    async def fetch_round_and_match(self, tid: int, table_no: int):
+        """
+        取當前輪（同 current_round：最新一輪）與其指定桌的對局：
+        回傳 (round_id, (match_id, p1_id, p2_id, result, winner_player_id) 或 None)；沒有任何輪次回傳 None
+        """
+        async with self.db_read() as conn:
+            async with conn.execute(
+                "SELECT r.id, m.id, m.p1_id, m.p2_id, m.result, m.winner_player_id "
+                "FROM (SELECT id FROM rounds WHERE tournament_id=? ORDER BY round_no DESC LIMIT 1) r "
+                "LEFT JOIN matches m ON m.round_id=r.id AND m.table_no=?",
+                (tid, table_no),
+            ) as cur:
+                r = await cur.fetchone()
+        if not r:
+            return None
+        return (r[0], tuple(r[1:]) if r[1] is not None else None)
+
+    async def close_round(self, rid: int) -> bool:
+        """結束本輪；回傳是否由這次呼叫結束（已結束者回 False，避免同時回報時重複收尾）。"""
         async with self.db() as conn:
-            await conn.execute("UPDATE rounds SET status='finished' WHERE id=?", (rid,))
+            cur = await conn.execute("UPDATE rounds SET status='finished' WHERE id=? AND status='ongoing'", (rid,))
             await conn.commit()
+        self._name_cache.pop(rid, None)
+        return cur.rowcount > 0
 
-    async def add_match(
-        self, tid: int, rid: int, table_no: int,
-        p1_id: Optional[int], p2_id: Optional[int],
-        result: Optional[str] = None, winner_player_id: Optional[int] = None, notes: Optional[str] = None
-    ) -> int:
+    async def add_matches_bulk(self, rows: List[tuple]) -> List[int]:
+        """
+        一次交易寫入多筆對局；rows 每筆為
+        (tid, rid, table_no, p1_id, p2_id, result, winner_player_id, notes)
+        已帶結果的列（如 BYE）在同一交易內照 _match_winner 規則加分。
+        回傳與 rows 同序的 match_id。
+        """
+        if not rows:
+            return []
+        rids = sorted({r[1] for r in rows})
+        winners = [(w,) for w in (self._match_winner(r[3], r[4], r[5]) for r in rows) if w is not None]
         async with self.db() as conn:
-            await conn.execute(
+            await conn.execute("BEGIN IMMEDIATE")
+            await conn.executemany(
                 "INSERT INTO matches(tournament_id,round_id,table_no,p1_id,p2_id,result,winner_player_id,notes) "
                 "VALUES(?,?,?,?,?,?,?,?)",
-                (tid, rid, table_no, p1_id, p2_id, result, winner_player_id, notes),
+                rows,
             )
+            if winners:
+                await conn.executemany(_SQL_ADD_WIN, winners)
+            ids = {(r[0], r[1]): r[2] for r in await conn.execute_fetchall(
+                f"SELECT round_id, table_no, id FROM matches WHERE round_id IN ({','.join('?' * len(rids))})",
+                rids,
+            )}
             await conn.commit()
-            async with conn.execute("SELECT last_insert_rowid()") as cur:
-                (mid,) = await cur.fetchone()
-                return int(mid)
+        return [int(ids[(r[1], r[2])]) for r in rows]
 
-    async def list_matches_round(self, rid: int):
+    async def add_players_bulk(self, tid: int, rows: List[Tuple[int, str]], active: int = 1) -> int:
+        """一次交易寫入多位選手；rows 為 (user_id, display_name)。已存在者略過，回傳實際新增數。"""
+        if not rows:
+            return 0
         async with self.db() as conn:
-            async with conn.execute(
+            await conn.execute("BEGIN IMMEDIATE")
+            cur = await conn.executemany(
+                _SQL_INSERT_PLAYER,
+                [(tid, uid, name, active) for uid, name in rows],
+            )
+            await conn.commit()
+            return max(cur.rowcount or 0, 0)
+
+    async def list_matches_round(self, rid: int):
+        async with self.db_read() as conn:
+            return await conn.execute_fetchall(
                 "SELECT id,table_no,p1_id,p2_id,result,winner_player_id FROM matches WHERE round_id=? ORDER BY table_no",
                 (rid,),
-            ) as cur:
-                return await cur.fetchall()
-
-    async def set_match_result(self, match_id: int, result: str, winner_pid: Optional[int], notes: Optional[str]):
-        async with self.db() as conn:
-            await conn.execute(
-                "UPDATE matches SET result=?, winner_player_id=?, notes=? WHERE id=?",
-                (result, winner_pid, notes, match_id),
             )
-            await conn.commit()
 
-    async def set_match_result_atomic(self, match_id: int, result: str, winner_pid: Optional[int]) -> tuple[bool, Optional[tuple[str, Optional[int]]]]:
+    async def round_has_pending(self, rid: int) -> bool:
+        """本輪是否還有未回報的對局；找到第一筆就停。"""
+        async with self.db_read() as conn:
+            async with conn.execute(
+                "SELECT 1 FROM matches WHERE round_id=? AND result IS NULL LIMIT 1", (rid,)
+            ) as cur:
+                return (await cur.fetchone()) is not None
+
+    async def set_match_result_atomic(self, match_id: int, result: str, winner_pid: Optional[int],
+                                      credit_winner: bool = False) -> tuple[bool, Optional[tuple[str, Optional[int]]]]:
         """
         Atomic write:
         - succeed only if current result IS NULL
+        - credit_winner=True: on success, also give winner_pid +3 in the same transaction
         - return (ok, current) where:
             ok=True  => your write was applied
             ok=False => someone already set it; current=(existing_result, existing_winner_pid)
         """
         async with self.db() as conn:
+            # RETURNING 需 SQLite >= 3.35；先取完結果再 commit
+            async with conn.execute(
+                "UPDATE matches SET result=?, winner_player_id=? WHERE id=? AND result IS NULL "
+                "RETURNING result, winner_player_id",
+                (result, winner_pid, match_id)
+            ) as cur:
+                row = await cur.fetchone()
+            if row and credit_winner and winner_pid is not None:
+                await conn.execute(_SQL_ADD_WIN, (winner_pid,))
+            await conn.commit()
+            if row:
+                return (True, (row[0], row[1]))
             async with conn.execute("SELECT result, winner_player_id FROM matches WHERE id=?", (match_id,)) as cur:
                 row = await cur.fetchone()
-            if row and row[0] is not None:
-                return (False, (row[0], row[1]))
+            return (False, (row[0] if row else None, row[1] if row else None))
 
-            cur2 = await conn.execute(
-                "UPDATE matches SET result=?, winner_player_id=? WHERE id=? AND result IS NULL",
-                (result, winner_pid, match_id)
+    async def set_match_results_bulk(self, results: List[Tuple[int, str, int]]) -> List[int]:
+        """
+        批次版 set_match_result_atomic(credit_winner=True)（僅 p1/p2 勝負），單一交易。
+        results: [(match_id, 'p1'|'p2', winner_pid)]；回傳實際寫入（原本未回報）的 match_id。
+        """
+        applied: List[Tuple[int, int]] = []
+        async with self.db_write() as conn:
+            await conn.execute("BEGIN IMMEDIATE")
+            for mid, res, wpid in results:
+                async with conn.execute(
+                    "UPDATE matches SET result=?, winner_player_id=? WHERE id=? AND result IS NULL RETURNING id",
+                    (res, wpid, mid)
+                ) as cur:
+                    if await cur.fetchone():
+                        applied.append((mid, wpid))
+            await conn.executemany(
+                _SQL_ADD_WIN, [(wpid,) for _mid, wpid in applied]
             )
             await conn.commit()
-            ok = (cur2.rowcount or 0) > 0
-
-            if ok:
-                return (True, (result, winner_pid))
-            else:
-                async with conn.execute("SELECT result, winner_player_id FROM matches WHERE id=?", (match_id,)) as cur3:
-                    row2 = await cur3.fetchone()
-                return (False, (row2[0] if row2 else None, row2[1] if row2 else None))
+        return [mid for mid, _wpid in applied]
+
+    @staticmethod
+    def _match_winner(p1_id: Optional[int], p2_id: Optional[int], result: Optional[str]) -> Optional[int]:
+        """計分規則：每勝一場 +3 分；BYE 也視為 +3（只在恰好一側有人時）。回傳得分者 pid；無人得分回傳 None。"""
+        if result == "p1":
+            return p1_id
+        if result == "p2":
+            return p2_id
+        if result == "bye" and (p1_id is None) != (p2_id is None):
+            return p1_id if p2_id is None else p2_id
+        return None
 
-    async def update_score_for_match(self, tid: int, p1_id: Optional[int], p2_id: Optional[int], result: str, winner_pid: Optional[int]):
-        """每勝一場 +3 分；BYE 也視為 +3。"""
-        delta = 3
+    async def apply_match_delta(self, conn: aiosqlite.Connection, p1_id: Optional[int], p2_id: Optional[int],
+                                old_res: Optional[str], new_res: Optional[str]):
+        """在呼叫端的交易內把單桌結果由 old_res 改成 new_res 的分數差套到選手（不 commit）。"""
+        delta: Dict[int, int] = {}
+        old_w = self._match_winner(p1_id, p2_id, old_res)
+        new_w = self._match_winner(p1_id, p2_id, new_res)
+        if old_w is not None:
+            delta[old_w] = delta.get(old_w, 0) - 3
+        if new_w is not None:
+            delta[new_w] = delta.get(new_w, 0) + 3
+        rows = [(d, pid) for pid, d in delta.items() if d]
+        if rows:  # 覆寫成同一勝者時分數不變，不必多跑一次
+            await conn.executemany("UPDATE players SET score=score+? WHERE id=?", rows)
+
+    async def recompute_scores(self, tid: int, conn: Optional[aiosqlite.Connection] = None):
+        """依 matches 一次重算全部積分（規則同 _match_winner）。
+
+        傳入 conn 時沿用呼叫端的連線/交易，不另取連線也不 commit。
+        """
+        if conn is not None:
+            return await self._recompute_scores_rows(conn, tid)
         async with self.db() as conn:
-            if result == "p1" and p1_id:
-                await conn.execute("UPDATE players SET score=score+? WHERE id=?", (delta, p1_id))
-            elif result == "p2" and p2_id:
-                await conn.execute("UPDATE players SET score=score+? WHERE id=?", (delta, p2_id))
-            elif result == "bye":
-                if p1_id and not p2_id:
-                    await conn.execute("UPDATE players SET score=score+? WHERE id=?", (delta, p1_id))
-                if p2_id and not p1_id:
-                    await conn.execute("UPDATE players SET score=score+? WHERE id=?", (delta, p2_id))
+            await self._recompute_scores_rows(conn, tid)
             await conn.commit()
 
-    async def recompute_scores(self, tid: int):
-        async with self.db() as conn:
-            await conn.execute("UPDATE players SET score=0 WHERE tournament_id=?", (tid,))
-            async with conn.execute(
-                "SELECT p1_id,p2_id,result,winner_player_id FROM matches WHERE tournament_id=?",
-                (tid,),
-            ) as cur:
-                rows = await cur.fetchall()
-            await conn.commit()
-        for p1, p2, res, wpid in rows:
-            if not res:
-                continue
-            await self.update_score_for_match(tid, p1, p2, res, wpid)
+    @staticmethod
+    async def _recompute_scores_rows(conn: aiosqlite.Connection, tid: int):
+        # 歸零與加總合成一句：沒有勝場的人 COALESCE 成 0
+        await conn.execute(
+            """
+            WITH wins(pid) AS (
+                SELECT CASE result
+                    WHEN 'p1' THEN p1_id
+                    WHEN 'p2' THEN p2_id
+                    ELSE CASE WHEN p2_id IS NULL THEN p1_id WHEN p1_id IS NULL THEN p2_id END
+                END
+                FROM matches WHERE tournament_id=?1 AND result IN ('p1','p2','bye')
+            ), agg AS (
+                SELECT pid, 3*COUNT(*) AS s FROM wins WHERE pid IS NOT NULL GROUP BY pid
+            )
+            UPDATE players SET score=COALESCE((SELECT s FROM agg WHERE agg.pid=players.id), 0)
+            WHERE tournament_id=?1
+            """,
+            (tid,),
+        )
 
     # ---------- Match meta helpers ----------
-    async def _mpm_get(self, match_id: int, player_pid: int) -> Dict[str, Optional[str]]:
+    async def _mpm_upsert(self, match_id: int, player_pid: int,
+                          player_decks: Optional[Tuple[Optional[str], Optional[str], Optional[str]]] = None,
+                          **fields) -> Optional[Dict[str, Optional[str]]]:
+        """
+        寫入/更新本局職業並以 RETURNING 帶回合併後的整列（不必再回頭 SELECT）。
+        player_decks=(deck1, deck2, actual_class) 時，同一交易順便寫回 players。
+        """
+        set_cols = tuple(k for k in _MPM_COLS if k in fields)
         async with self.db() as conn:
             async with conn.execute(
-                "SELECT pick1,pick2,actual FROM match_player_meta WHERE match_id=? AND player_id=?",
-                (match_id, player_pid)
+                _MPM_UPSERT_SQL[set_cols] + " RETURNING pick1, pick2, actual",
+                (match_id, player_pid, fields.get("pick1"), fields.get("pick2"), fields.get("actual"))
             ) as cur:
                 r = await cur.fetchone()
-        if not r:
-            return {"pick1": None, "pick2": None, "actual": None}
-        return {"pick1": r[0], "pick2": r[1], "actual": r[2]}
-
-    async def _mpm_upsert(self, match_id: int, player_pid: int, **fields):
-        cols_allowed = ("pick1", "pick2", "actual")
-        ins_pick1 = fields.get("pick1")
-        ins_pick2 = fields.get("pick2")
-        ins_actual = fields.get("actual")
-        set_cols = [k for k in cols_allowed if k in fields]
-        if not set_cols:
-            async with self.db() as conn:
+            if player_decks is not None:
                 await conn.execute(
-                    "INSERT OR IGNORE INTO match_player_meta(match_id, player_id, pick1, pick2, actual) VALUES(?,?,?,?,?)",
-                    (match_id, player_pid, ins_pick1, ins_pick2, ins_actual)
+                    _SQL_SET_PLAYER_DECKS,
+                    (*player_decks, player_pid)
                 )
-                await conn.commit()
-            return
-        set_clause = ", ".join([f"{c}=?" for c in set_cols])
-        set_vals = [fields[c] for c in set_cols]
-        async with self.db() as conn:
-            await conn.execute(
-                """
-                INSERT INTO match_player_meta(match_id, player_id, pick1, pick2, actual)
-                VALUES(?,?,?,?,?)
-                ON CONFLICT(match_id, player_id) DO UPDATE SET """ + set_clause,
-                (match_id, player_pid, ins_pick1, ins_pick2, ins_actual, *set_vals)
-            )
-            await conn.commit()
-
-    async def _player_set_decks_if_ready(self, player_pid: int, pick1: Optional[str], pick2: Optional[str], actual: Optional[str]):
-        async with self.db() as conn:
-            await conn.execute(
-                "UPDATE players SET deck1=?, deck2=?, actual_class=? WHERE id=?",
-                (pick1, pick2, actual, player_pid)
-            )
             await conn.commit()
+        return {"pick1": r[0], "pick2": r[1], "actual": r[2]} if r else None
 
     # -------------- Views --------------
     class RegView(discord.ui.View):
@@ -554,35 +1121,39 @@ class SwissAll(commands.Cog):
 
         @discord.ui.button(label="報名 Join", style=discord.ButtonStyle.success, custom_id="swiss:join")
         async def join(self, interaction: discord.Interaction, button: discord.ui.Button):
+            if not interaction.response.is_done():
+                await interaction.response.defer(ephemeral=True)
             await self.cog.setup_db()
             cur_status = await self.cog.tour_status(self.tid)
             # 開賽後鎖報名
             if cur_status not in ("register", "seeding"):
-                return await interaction.response.send_message("目前已開賽，暫不開放報名。", ephemeral=True)
+                return await self.cog._reply(interaction, "目前已開賽，暫不開放報名。")
 
             status = await self.cog.add_player(self.tid, interaction.user, active=1)
             if status == "banned":
-                return await interaction.response.send_message("你已被本賽事封禁，無法報名。", ephemeral=True)
+                return await self.cog._reply(interaction, "你已被本賽事封禁，無法報名。")
             msg = {
                 "new": "已加入報名。",
                 "reactivated": "你已在名單中，已恢復參賽狀態。",
                 "already": "你已在名單中（目前是參賽狀態）。"
             }.get(status, "OK")
-            await interaction.response.send_message(msg, ephemeral=True)
+            await self.cog._reply(interaction, msg)
 
 
         @discord.ui.button(label="退出 Leave", style=discord.ButtonStyle.secondary, custom_id="swiss:leave")
         async def leave(self, interaction: discord.Interaction, button: discord.ui.Button):
+            if not interaction.response.is_done():
+                await interaction.response.defer(ephemeral=True)
             await self.cog.setup_db()
             cur_status = await self.cog.tour_status(self.tid)  # register / swiss / top4_finals / ...
             await self.cog.mark_drop(self.tid, interaction.user.id)
 
             if cur_status in ("register", "seeding"):
                 # 報名期 → 視為取消報名
-                await interaction.response.send_message("已取消報名。", ephemeral=True)
+                await self.cog._reply(interaction, "已取消報名。")
             else:
                 # 比賽中 → 視為退賽
-                await interaction.response.send_message("已標記退賽(下一輪不再配對)。", ephemeral=True)
+                await self.cog._reply(interaction, "已標記退賽(下一輪不再配對)。")
 
 
 
@@ -594,53 +1165,42 @@ class SwissAll(commands.Cog):
             self.cog = cog
             self.tid = tid
             self.rid = rid
+            # 七職業＋重置
+            # 七顆按鈕共用同一個 callback，由 custom_id 的 slug 查回職業名
+            for label, slug in zip(CLASS_LABELS, CLASS_SLUGS):
+                btn = discord.ui.Button(label=label, style=discord.ButtonStyle.secondary, custom_id=f"swiss:rdeck:{slug}:{tid}:{rid}")
+                btn.callback = self._on_pick
+                self.add_item(btn)
+            btn = discord.ui.Button(label="按錯點我重製", style=discord.ButtonStyle.danger, custom_id=f"swiss:rdeck:reset:{tid}:{rid}")
+            btn.callback = self._reset
+            self.add_item(btn)
+
+        async def _on_pick(self, itx: discord.Interaction):
+            slug = itx.data["custom_id"].split(":")[2]
+            await self._pick(itx, _SLUG_LABEL[slug])
 
         async def _pick(self, itx: discord.Interaction, label: str):
-            r = await self.cog._find_user_round_match(self.tid, self.rid, itx.user.id)
-            if not r:
-                return await itx.response.send_message("找不到你在本輪的對局。", ephemeral=True)
-            pid, (mid, *_rest) = r
-            meta = await self.cog._mpm_get(mid, pid)
-            p1, p2 = meta["pick1"], meta["pick2"]
-            if label in (p1, p2):
-                return await itx.response.send_message("不可重複選相同職業。", ephemeral=True)
-            if p1 is None:
-                await self.cog._mpm_upsert(mid, pid, pick1=label)
-                await self.cog._player_set_decks_if_ready(pid, label, p2, meta["actual"])
-                return await itx.response.send_message(f"已選擇第一職業：{label}", ephemeral=True)
-            if p2 is None:
-                await self.cog._mpm_upsert(mid, pid, pick2=label)
-                await self.cog._player_set_decks_if_ready(pid, p1, label, meta["actual"])
-                return await itx.response.send_message(f"已選擇第二職業：{label}", ephemeral=True)
-            return await itx.response.send_message("你已選滿兩個職業，若要重選請按「按錯點我重製」。", ephemeral=True)
+            if not itx.response.is_done():
+                await itx.response.defer(ephemeral=True)
+            status = await self.cog._apply_pick(self.tid, self.rid, itx.user.id, label)
+            msg = {
+                "nomatch": "找不到你在本輪的對局。",
+                "dup": "不可重複選相同職業。",
+                "pick1": f"已選擇第一職業：{label}",
+                "pick2": f"已選擇第二職業：{label}",
+                "full": "你已選滿兩個職業，若要重選請按「按錯點我重製」。",
+            }[status]
+            await self.cog._reply(itx, msg)
 
         async def _reset(self, itx: discord.Interaction):
+            if not itx.response.is_done():
+                await itx.response.defer(ephemeral=True)
             r = await self.cog._find_user_round_match(self.tid, self.rid, itx.user.id)
             if not r:
-                return await itx.response.send_message("找不到你在本輪的對局。", ephemeral=True)
+                return await self.cog._reply(itx, "找不到你在本輪的對局。")
             pid, (mid, *_rest) = r
-            await self.cog._mpm_upsert(mid, pid, pick1=None, pick2=None)
-            await self.cog._player_set_decks_if_ready(pid, None, None, None)
-            await itx.response.send_message("已重置你的兩個職業選擇。", ephemeral=True)
-
-        # 七職業＋重置
-        @discord.ui.button(label="精靈", style=discord.ButtonStyle.secondary, custom_id="swiss:rdeck:elf")
-        async def d_elf(self, itx, _):   await self._pick(itx, "精靈")
-        @discord.ui.button(label="皇家", style=discord.ButtonStyle.secondary, custom_id="swiss:rdeck:royal")
-        async def d_royal(self, itx, _): await self._pick(itx, "皇家")
-        @discord.ui.button(label="巫師", style=discord.ButtonStyle.secondary, custom_id="swiss:rdeck:witch")
-        async def d_witch(self, itx, _): await self._pick(itx, "巫師")
-        @discord.ui.button(label="龍族", style=discord.ButtonStyle.secondary, custom_id="swiss:rdeck:dragon")
-        async def d_dragon(self, itx, _): await self._pick(itx, "龍族")
-        @discord.ui.button(label="夜魔", style=discord.ButtonStyle.secondary, custom_id="swiss:rdeck:night")
-        async def d_night(self, itx, _):  await self._pick(itx, "夜魔")
-        @discord.ui.button(label="主教", style=discord.ButtonStyle.secondary, custom_id="swiss:rdeck:bishop")
-        async def d_bishop(self, itx, _): await self._pick(itx, "主教")
-        @discord.ui.button(label="復仇者", style=discord.ButtonStyle.secondary, custom_id="swiss:rdeck:avenger")
-        async def d_avenger(self, itx, _):await self._pick(itx, "復仇者")
-
-        @discord.ui.button(label="按錯點我重製", style=discord.ButtonStyle.danger, custom_id="swiss:rdeck:reset")
-        async def d_reset(self, itx, _):  await self._reset(itx)
+            await self.cog._mpm_upsert(mid, pid, player_decks=(None, None, None), pick1=None, pick2=None)
+            await self.cog._reply(itx, "已重置你的兩個職業選擇。")
 
     class RoundWinnerView(discord.ui.View):
         """面板 2：贏家按此(公開公告『桌X：A 勝 B』；非臨時訊息) + 原子防重覆"""
@@ -649,47 +1209,40 @@ class SwissAll(commands.Cog):
             self.cog = cog
             self.tid = tid
             self.rid = rid
+            self.b_winner.custom_id = f"swiss:rwinner:{tid}:{rid}"
 
         @discord.ui.button(label="贏家", style=discord.ButtonStyle.success, custom_id="swiss:rwinner")
         async def b_winner(self, itx: discord.Interaction, _):
+            if not itx.response.is_done():
+                await itx.response.defer(ephemeral=True)
             r = await self.cog._find_user_round_match(self.tid, self.rid, itx.user.id)
             if not r:
-                return await itx.response.send_message("找不到你在本輪的對局。", ephemeral=True)
+                return await self.cog._reply(itx, "找不到你在本輪的對局。")
             pid, (mid, table_no, p1_id, p2_id, result, _) = r
             if result is not None:
-                return await itx.response.send_message("本桌已回報完成。", ephemeral=True)
+                return await self.cog._reply(itx, "本桌已回報完成。")
             if pid not in (p1_id, p2_id):
-                return await itx.response.send_message("這不是你的對局。", ephemeral=True)
+                return await self.cog._reply(itx, "這不是你的對局。")
 
             res = "p1" if pid == p1_id else "p2"
 
-            ok, current = await self.cog.set_match_result_atomic(mid, res, pid)
+            # 寫結果與計分同一交易；只有第一個成功的人會計分
+            ok, current = await self.cog.set_match_result_atomic(mid, res, pid, credit_winner=True)
             if not ok:
                 # 已被他人搶先
                 exist_res, exist_wpid = current or (None, None)
-                # 查名字
-                async with self.cog.db() as conn:
-                    async with conn.execute("SELECT display_name FROM players WHERE id=?", (exist_wpid,)) as c:
-                        rr = await c.fetchone()
-                name = rr[0] if rr else "?"
-                return await itx.response.send_message(f"本桌已由 {name} 回報完成。", ephemeral=True)
-
-            # 計分（只有第一個成功的人會計分）
-            await self.cog.update_score_for_match(self.tid, p1_id, p2_id, res, pid)
+                name = (await self.cog._round_names(self.tid, self.rid, [exist_wpid])).get(exist_wpid, "?")
+                return await self.cog._reply(itx, f"本桌已由 {name} 回報完成。")
 
             # 公開公告
-            async with self.cog.db() as conn:
-                async with conn.execute("SELECT display_name FROM players WHERE id=?", (p1_id,)) as c1:
-                    r1 = await c1.fetchone()
-                async with conn.execute("SELECT display_name FROM players WHERE id=?", (p2_id,)) as c2:
-                    r2 = await c2.fetchone()
-            name1 = r1[0] if r1 else "?"
-            name2 = r2[0] if r2 else "?"
+            names = await self.cog._round_names(self.tid, self.rid, [p1_id, p2_id])
+            name1 = names.get(p1_id, "?")
+            name2 = names.get(p2_id, "?")
             winner_name = name1 if res == "p1" else name2
             loser_name  = name2 if res == "p1" else name1
             await itx.channel.send(f"桌 {table_no}：{winner_name} 勝 {loser_name}(match {mid})")
 
-            await itx.response.send_message("已記錄勝利並公告。", ephemeral=True)
+            await self.cog._reply(itx, "已記錄勝利並公告。")
             await self.cog._maybe_on_round_complete(self.tid, self.rid, itx.channel)
 
     class RoundActualView(discord.ui.View):
@@ -699,38 +1252,34 @@ class SwissAll(commands.Cog):
             self.cog = cog
             self.tid = tid
             self.rid = rid
+            # 單選下拉選單（一個元件取代七顆按鈕）
+            sel = discord.ui.Select(
+                placeholder="選擇本場實際使用的職業",
+                options=[discord.SelectOption(label=label, value=label) for label in CLASS_LABELS],
+                custom_id=f"swiss:ractual:sel:{tid}:{rid}",
+            )
+            sel.callback = self._on_select
+            self.add_item(sel)
+
+        async def _on_select(self, itx: discord.Interaction):
+            # 值直接取自互動資料；與 RoundDeckView._on_pick 相同，不必每個 view 建閉包
+            await self._set_actual(itx, itx.data["values"][0])
 
         async def _set_actual(self, itx: discord.Interaction, label: str):
-            r = await self.cog._find_user_round_match(self.tid, self.rid, itx.user.id)
+            if not itx.response.is_done():
+                await itx.response.defer(ephemeral=True)
+            r = await self.cog._find_user_round_meta(self.tid, self.rid, itx.user.id)
             if not r:
-                return await itx.response.send_message("找不到你在本輪的對局。", ephemeral=True)
-            pid, (mid, *_rest) = r
-            meta = await self.cog._mpm_get(mid, pid)
-            p1, p2 = meta["pick1"], meta["pick2"]
+                return await self.cog._reply(itx, "找不到你在本輪的對局。")
+            pid, mid, p1, p2, _actual = r
 
             if not p1 or not p2:
-                return await itx.response.send_message("請先完成兩個『使用牌組』的選擇，再回報實際職業。", ephemeral=True)
+                return await self.cog._reply(itx, "請先完成兩個『使用牌組』的選擇，再回報實際職業。")
             if label not in (p1, p2):
-                return await itx.response.send_message(f"實際職業需為你選的兩職業之一(目前：{p1} / {p2})。", ephemeral=True)
-
-            await self.cog._mpm_upsert(mid, pid, actual=label)
-            await self.cog._player_set_decks_if_ready(pid, p1, p2, label)
-            await itx.response.send_message(f"已記錄你的實際職業：{label}", ephemeral=True)
-
-        @discord.ui.button(label="精靈", style=discord.ButtonStyle.secondary, custom_id="swiss:ractual:elf")
-        async def a_elf(self, itx, _):    await self._set_actual(itx, "精靈")
-        @discord.ui.button(label="皇家", style=discord.ButtonStyle.secondary, custom_id="swiss:ractual:royal")
-        async def a_royal(self, itx, _):  await self._set_actual(itx, "皇家")
-        @discord.ui.button(label="巫師", style=discord.ButtonStyle.secondary, custom_id="swiss:ractual:witch")
-        async def a_witch(self, itx, _):  await self._set_actual(itx, "巫師")
-        @discord.ui.button(label="龍族", style=discord.ButtonStyle.secondary, custom_id="swiss:ractual:dragon")
-        async def a_dragon(self, itx, _): await self._set_actual(itx, "龍族")
-        @discord.ui.button(label="夜魔", style=discord.ButtonStyle.secondary, custom_id="swiss:ractual:night")
-        async def a_night(self, itx, _):  await self._set_actual(itx, "夜魔")
-        @discord.ui.button(label="主教", style=discord.ButtonStyle.secondary, custom_id="swiss:ractual:bishop")
-        async def a_bishop(self, itx, _): await self._set_actual(itx, "主教")
-        @discord.ui.button(label="復仇者", style=discord.ButtonStyle.secondary, custom_id="swiss:ractual:avenger")
-        async def a_avenger(self, itx, _):await self._set_actual(itx, "復仇者")
+                return await self.cog._reply(itx, f"實際職業需為你選的兩職業之一(目前：{p1} / {p2})。")
+
+            await self.cog._mpm_upsert(mid, pid, player_decks=(p1, p2, label), actual=label)
+            await self.cog._reply(itx, f"已記錄你的實際職業：{label}")
 
     class NextStepView(discord.ui.View):
         def __init__(self, cog: 'SwissAll', tid: int):
@@ -739,8 +1288,7 @@ class SwissAll(commands.Cog):
             self.tid = tid
 
         async def _is_organizer(self, itx: discord.Interaction) -> bool:
-            org = await self.cog.get_organizer(self.tid)
-            if itx.user.id == org or itx.user.guild_permissions.manage_guild:
+            if await self.cog._is_organizer_user(self.tid, itx.user):
                 return True
             await itx.response.send_message("只有賽事建立者或管理員可以按此。", ephemeral=True)
             return False
@@ -787,7 +1335,7 @@ class SwissAll(commands.Cog):
             status = await self.cog.add_player(self.tid, m, active=1)
             if status == "banned":
                 return await itx.response.send_message("該成員已被封禁，無法加入。", ephemeral=True)
-            await self.cog._audit(self.tid, itx.user.id, "admin_manual_add", f"user={m.id}, status={status}")
+            self.cog._audit(self.tid, itx.user.id, "admin_manual_add", f"user={m.id}, status={status}")
             await itx.response.send_message(f"已加入/恢復：{m.display_name}（{status}）", ephemeral=True)
 
     class _ManualDropModal(discord.ui.Modal, title="手動退賽"):
@@ -800,7 +1348,7 @@ class SwissAll(commands.Cog):
             m = await self.cog._resolve_member(itx.guild, str(self.who))
             if not m: return await itx.response.send_message("找不到成員。", ephemeral=True)
             await self.cog.mark_drop(self.tid, m.id)
-            await self.cog._audit(self.tid, itx.user.id, "admin_manual_drop", f"user={m.id}")
+            self.cog._audit(self.tid, itx.user.id, "admin_manual_drop", f"user={m.id}")
             await itx.response.send_message(f"已設為退賽：{m.display_name}", ephemeral=True)
 
     class _AddAndReseatR1Modal(discord.ui.Modal, title="第一輪加人並重抽"):
@@ -809,34 +1357,37 @@ class SwissAll(commands.Cog):
         def __init__(self, cog: 'SwissAll', tid: int):
             super().__init__(); self.cog = cog; self.tid = tid
         async def on_submit(self, itx: discord.Interaction):
+            # 重抽要刪對局再配對並發訊息，先 ack 避免超過 3 秒
+            await itx.response.defer(ephemeral=True, thinking=True)
             if not await self.cog._is_organizer_user(self.tid, itx.user):
-                return await itx.response.send_message("沒有權限。", ephemeral=True)
+                return await self.cog._reply(itx, "沒有權限。")
             cur = await self.cog.current_round(self.tid)
             if not cur:
-                return await itx.response.send_message("目前沒有進行中的輪次。", ephemeral=True)
+                return await self.cog._reply(itx, "目前沒有進行中的輪次。")
             rid, rno, status = cur
             if rno != 1 or status != "ongoing":
-                return await itx.response.send_message("僅第一輪進行中可使用此功能。", ephemeral=True)
+                return await self.cog._reply(itx, "僅第一輪進行中可使用此功能。")
 
             m = await self.cog._resolve_member(itx.guild, str(self.who))
             if not m:
-                return await itx.response.send_message("找不到該成員。", ephemeral=True)
+                return await self.cog._reply(itx, "找不到該成員。")
 
             # 加入或恢復
             status = await self.cog.add_player(self.tid, m, active=1)
             if status == "banned":
-                return await itx.response.send_message("該成員已被封禁，無法加入。", ephemeral=True)
+                return await self.cog._reply(itx, "該成員已被封禁，無法加入。")
 
             # 砍掉 R1 對局，重抽
+            # match_player_meta 由 trg_matches_delete_meta 一併清除
             async with self.cog.db() as conn:
-                await conn.execute("DELETE FROM match_player_meta WHERE match_id IN (SELECT id FROM matches WHERE round_id=?)", (rid,))
                 await conn.execute("DELETE FROM matches WHERE round_id=?", (rid,))
                 await conn.commit()
+            self.cog._name_cache.pop(rid, None)
 
             await itx.channel.send(f"⚠️ 第一輪重新配對：因新增 {m.display_name}（{str(self.note) or '無備註'}）。")
-            await self.cog._audit(self.tid, itx.user.id, "admin_add_and_reseat_r1", f"add_uid={m.id}, note={self.note}")
+            self.cog._audit(self.tid, itx.user.id, "admin_add_and_reseat_r1", f"add_uid={m.id}, note={self.note}")
             await self.cog._pair_and_post(itx.channel, self.tid, rid)
-            await itx.response.send_message("已加入並重新配對第一輪。", ephemeral=True)
+            await self.cog._reply(itx, "已加入並重新配對第一輪。")
 
 
     class _SetWinnerModal(discord.ui.Modal, title="指定桌勝者（當前輪）"):
@@ -847,25 +1398,20 @@ class SwissAll(commands.Cog):
         def __init__(self, cog: 'SwissAll', tid: int):
             super().__init__(); self.cog = cog; self.tid = tid
         async def on_submit(self, itx: discord.Interaction):
+            await itx.response.defer(ephemeral=True, thinking=True)
             if not await self.cog._is_organizer_user(self.tid, itx.user):
-                return await itx.response.send_message("沒有權限。", ephemeral=True)
-            cur = await self.cog.current_round(self.tid)
-            if not cur: return await itx.response.send_message("沒有進行中的輪次。", ephemeral=True)
-            rid, _, _ = cur
+                return await self.cog._reply(itx, "沒有權限。")
             try:
                 tno = int(str(self.table_no).strip())
             except ValueError:
-                return await itx.response.send_message("桌號需為數字。", ephemeral=True)
+                return await self.cog._reply(itx, "桌號需為數字。")
 
-            # 找到該桌 match
-            async with self.cog.db() as conn:
-                async with conn.execute(
-                    "SELECT id,p1_id,p2_id,result,winner_player_id FROM matches WHERE round_id=? AND table_no=?",
-                    (rid, tno)
-                ) as cur2:
-                    mrow = await cur2.fetchone()
+            # 當前輪＋該桌 match 一次查
+            found = await self.cog.fetch_round_and_match(self.tid, tno)
+            if not found: return await self.cog._reply(itx, "沒有進行中的輪次。")
+            _rid, mrow = found
             if not mrow:
-                return await itx.response.send_message("找不到該桌。", ephemeral=True)
+                return await self.cog._reply(itx, "找不到該桌。")
 
             mid, p1, p2, res, wpid = mrow
             winner_pid = None
@@ -876,29 +1422,43 @@ class SwissAll(commands.Cog):
                 winner_pid = p2; new_res = "p2"
             else:
                 mm = await self.cog._resolve_member(itx.guild, str(self.winner))
-                if not mm: return await itx.response.send_message("無法解析勝者。", ephemeral=True)
+                if not mm: return await self.cog._reply(itx, "無法解析勝者。")
                 # map to pid
                 pid = await self.cog._player_pid_by_user(self.tid, mm.id)
-                if pid not in (p1, p2): return await itx.response.send_message("該玩家不在此桌。", ephemeral=True)
+                if pid not in (p1, p2): return await self.cog._reply(itx, "該玩家不在此桌。")
                 winner_pid = pid; new_res = "p1" if pid == p1 else "p2"
 
             # 覆寫判斷
             override = (str(self.confirm).strip().upper() == "OVERRIDE")
             if res is not None and not override:
-                return await itx.response.send_message("本桌已回報完成。若確定要覆寫，請在覆寫欄輸入 OVERRIDE。", ephemeral=True)
-
-            async with self.cog.db() as conn:
-                await conn.execute(
-                    "UPDATE matches SET result=?, winner_player_id=?, notes=? WHERE id=?",
-                    (new_res, winner_pid, f"ADMIN:{str(self.note)}", mid)
-                )
-                await conn.commit()
-
-            # 重新計分（安全起見直接整體重算）
-            await self.cog.recompute_scores(self.tid)
-            await self.cog._audit(self.tid, itx.user.id, "admin_set_winner",
-                                  f"t={tno}, mid={mid}, res={new_res}, winner_pid={winner_pid}, override={override}")
-            await itx.response.send_message(f"已設定：桌 {tno} → {('P1' if new_res=='p1' else 'P2')} 勝。", ephemeral=True)
+                return await self.cog._reply(itx, "本桌已回報完成。若確定要覆寫，請在覆寫欄輸入 OVERRIDE。")
+
+            async with self.cog.db_write() as conn:
+                await conn.execute("BEGIN IMMEDIATE")
+                old_res = None
+                if override:
+                    # 覆寫才需要舊結果來算分差；交易內重讀，避免與玩家按鈕競態
+                    async with conn.execute("SELECT result FROM matches WHERE id=?", (mid,)) as cur2:
+                        (old_res,) = await cur2.fetchone()
+                # 非覆寫時由 WHERE 保證仍未回報（舊結果即 NULL）；回不了列代表剛被玩家搶先回報
+                async with conn.execute(
+                    "UPDATE matches SET result=?, winner_player_id=?, notes=? "
+                    "WHERE id=? AND (result IS NULL OR ?) RETURNING id",
+                    (new_res, winner_pid, f"ADMIN:{str(self.note)}", mid, override)
+                ) as cur2:
+                    applied = await cur2.fetchone()
+                if applied:
+                    # 只調整受影響的兩人分數；整體重算改由面板「重算積分」按鈕手動觸發
+                    await self.cog.apply_match_delta(conn, p1, p2, old_res, new_res)
+                    await conn.commit()
+                else:
+                    await conn.rollback()
+            # 離開寫入鎖後才回覆 Discord
+            if not applied:
+                return await self.cog._reply(itx, "本桌已回報完成。若確定要覆寫，請在覆寫欄輸入 OVERRIDE。")
+            self.cog._audit(self.tid, itx.user.id, "admin_set_winner",
+                            f"t={tno}, mid={mid}, res={new_res}, winner_pid={winner_pid}, override={override}")
+            await self.cog._reply(itx, f"已設定：桌 {tno} → {('P1' if new_res=='p1' else 'P2')} 勝。")
 
     class _SwapTableModal(discord.ui.Modal, title="一鍵改桌（交換兩位玩家當前桌號）"):
         a_text = discord.ui.TextInput(label="玩家A（@提及 / ID / 名稱）", required=True)
@@ -907,40 +1467,51 @@ class SwissAll(commands.Cog):
         def __init__(self, cog: 'SwissAll', tid: int):
             super().__init__(); self.cog = cog; self.tid = tid
         async def on_submit(self, itx: discord.Interaction):
+            await itx.response.defer(ephemeral=True, thinking=True)
             if not await self.cog._is_organizer_user(self.tid, itx.user):
-                return await itx.response.send_message("沒有權限。", ephemeral=True)
+                return await self.cog._reply(itx, "沒有權限。")
             cur = await self.cog.current_round(self.tid)
-            if not cur: return await itx.response.send_message("目前沒有進行中的輪次。", ephemeral=True)
+            if not cur: return await self.cog._reply(itx, "目前沒有進行中的輪次。")
             rid, _, _ = cur
-            mA = await self.cog._resolve_member(itx.guild, str(self.a_text))
-            mB = await self.cog._resolve_member(itx.guild, str(self.b_text))
+            mA, mB = await asyncio.gather(
+                self.cog._resolve_member(itx.guild, str(self.a_text)),
+                self.cog._resolve_member(itx.guild, str(self.b_text)),
+            )
             if not mA or not mB:
-                return await itx.response.send_message("找不到其中一位成員。", ephemeral=True)
-            pidA = await self.cog._player_pid_by_user(self.tid, mA.id)
-            pidB = await self.cog._player_pid_by_user(self.tid, mB.id)
-            if not pidA or not pidB:
-                return await itx.response.send_message("兩位都必須在本賽事名單內。", ephemeral=True)
-            mrowA = await self.cog._find_match_by_pid(rid, pidA)
-            mrowB = await self.cog._find_match_by_pid(rid, pidB)
+                return await self.cog._reply(itx, "找不到其中一位成員。")
+            if mA.id == mB.id:
+                return await self.cog._reply(itx, "玩家A與玩家B是同一人，無需交換。")
+            found = await self.cog._users_round_matches(self.tid, rid, [mA.id, mB.id])
+            if mA.id not in found or mB.id not in found:
+                return await self.cog._reply(itx, "兩位都必須在本賽事名單內。")
+            # found[uid] = (pid, (match_id, table_no, p1_id, p2_id, result) 或 None)
+            mrowA, mrowB = found[mA.id][1], found[mB.id][1]
             if not mrowA or not mrowB:
-                return await itx.response.send_message("其中一位目前沒有被分配到桌號。", ephemeral=True)
-            (midA, tnoA, _p1A, _p2A, resA), (midB, tnoB, _p1B, _p2B, resB) = mrowA, mrowB
+                return await self.cog._reply(itx, "其中一位目前沒有被分配到桌號。")
+            midA, tnoA, resA = mrowA[0], mrowA[1], mrowA[4]
+            midB, tnoB, resB = mrowB[0], mrowB[1], mrowB[4]
+            if midA == midB:
+                return await self.cog._reply(itx, "兩位在同一桌，無需交換。")
             if (resA is not None) or (resB is not None):
-                return await itx.response.send_message("有一桌已回報完成，無法交換。", ephemeral=True)
+                return await self.cog._reply(itx, "有一桌已回報完成，無法交換。")
 
             async with self.cog.db() as conn:
-                await conn.execute("UPDATE matches SET table_no=-1 WHERE id=?", (midA,))
-                await conn.execute("UPDATE matches SET table_no=? WHERE id=?", (tnoA, midB))
-                await conn.execute("UPDATE matches SET table_no=? WHERE id=?", (tnoB, midA))
+                await conn.execute("BEGIN IMMEDIATE")
+                # 先翻成負數讓出桌號（唯一索引只管正桌號），再一次換回
+                await conn.execute("UPDATE matches SET table_no=-table_no WHERE id IN (?,?)", (midA, midB))
+                await conn.execute(
+                    "UPDATE matches SET table_no=CASE id WHEN ? THEN ? ELSE ? END WHERE id IN (?,?)",
+                    (midA, tnoB, tnoA, midA, midB)
+                )
                 await conn.commit()
 
-            await self.cog._audit(self.tid, itx.user.id, "admin_swap_table",
-                                  f"A={mA.id}(mid={midA},t={tnoA}) <-> B={mB.id}(mid={midB},t={tnoB}); note={self.note}")
-            await itx.response.send_message(
+            self.cog._audit(self.tid, itx.user.id, "admin_swap_table",
+                            f"A={mA.id}(mid={midA},t={tnoA}) <-> B={mB.id}(mid={midB},t={tnoB}); note={self.note}")
+            await self.cog._reply(
+                itx,
                 f"已交換桌號：\n"
                 f"- {mA.display_name}：桌 {tnoA} → {tnoB}\n"
                 f"- {mB.display_name}：桌 {tnoB} → {tnoA}",
-                ephemeral=True
             )
 
     class _BanModal(discord.ui.Modal, title="封禁"):
@@ -955,12 +1526,13 @@ class SwissAll(commands.Cog):
             if not m: return await itx.response.send_message("找不到成員。", ephemeral=True)
             async with self.cog.db() as conn:
                 await conn.execute(
-                    "INSERT OR IGNORE INTO tournament_bans(tournament_id,user_id,reason,by_user_id,created_at) VALUES(?,?,?,?,?)",
+                    _SQL_INSERT_BAN,
                     (self.tid, m.id, str(self.reason), itx.user.id, int(time.time()))
                 )
+                await self.cog._mark_drop_rows(conn, self.tid, [m.id])
                 await conn.commit()
-            await self.cog.mark_drop(self.tid, m.id)
-            await self.cog._audit(self.tid, itx.user.id, "admin_ban", f"user={m.id}, reason={self.reason}")
+            self.cog._ban_cache.pop(self.tid, None)
+            self.cog._audit(self.tid, itx.user.id, "admin_ban", f"user={m.id}, reason={self.reason}")
             await itx.response.send_message(f"已封禁並退賽：{m.display_name}", ephemeral=True)
 
     class _UnbanModal(discord.ui.Modal, title="解禁"):
@@ -978,7 +1550,8 @@ class SwissAll(commands.Cog):
                     (self.tid, m.id)
                 )
                 await conn.commit()
-            await self.cog._audit(self.tid, itx.user.id, "admin_unban", f"user={m.id}")
+            self.cog._ban_cache.pop(self.tid, None)
+            self.cog._audit(self.tid, itx.user.id, "admin_unban", f"user={m.id}")
             await itx.response.send_message(f"已解禁：{m.display_name}", ephemeral=True)
 
     class _BatchBanModal(discord.ui.Modal, title="批量封禁（每行一位，或以空白/逗號分隔）"):
@@ -992,55 +1565,75 @@ class SwissAll(commands.Cog):
         def __init__(self, cog: 'SwissAll', tid: int):
             super().__init__(); self.cog = cog; self.tid = tid
         async def on_submit(self, itx: discord.Interaction):
+            await itx.response.defer(ephemeral=True, thinking=True)
             if not await self.cog._is_organizer_user(self.tid, itx.user):
-                return await itx.response.send_message("沒有權限。", ephemeral=True)
-            raw = str(self.who_list).replace(",", " ").replace("\n", " ").strip()
-            tokens = [t for t in raw.split() if t]
+                return await self.cog._reply(itx, "沒有權限。")
+            # 同一 token 重複貼上只解析一次（名稱 / 未快取 ID 各自可能打一次 API）
+            tokens = list(dict.fromkeys(t for t in _LIST_SEP_RE.split(str(self.who_list)) if t))
             if not tokens:
-                return await itx.response.send_message("清單為空。", ephemeral=True)
+                return await self.cog._reply(itx, "清單為空。")
             rsn = str(self.reason) if self.reason else ""
-            ok, not_found = [], []
+            # 提及 / ID 且成員在快取內 → 直接取；其餘（名稱、需 fetch 的 ID）才走 _resolve_member
+            members: Dict[int, discord.Member] = {}
+            slow = []
             for tok in tokens:
-                m = await self.cog._resolve_member(itx.guild, tok)
-                if not m:
-                    not_found.append(tok); continue
+                mt = _MENTION_RE.fullmatch(tok) or _ID_RE.fullmatch(tok)
+                m = itx.guild.get_member(int(mt.group(1))) if mt else None
+                if m:
+                    members.setdefault(m.id, m)
+                else:
+                    slow.append(tok)
+            sem = asyncio.Semaphore(MEMBER_LOOKUP_CONCURRENCY)
+
+            async def _resolve(tok: str):
+                async with sem:
+                    return await self.cog._resolve_member(itx.guild, tok)
+
+            found = await asyncio.gather(*[_resolve(tok) for tok in slow], return_exceptions=True)
+            not_found = []
+            for tok, m in zip(slow, found):
+                if isinstance(m, discord.Member):
+                    members.setdefault(m.id, m)
+                else:
+                    not_found.append(tok)
+            if members:
+                now = int(time.time())
                 async with self.cog.db() as conn:
-                    await conn.execute(
-                        "INSERT OR IGNORE INTO tournament_bans(tournament_id,user_id,reason,by_user_id,created_at) VALUES(?,?,?,?,?)",
-                        (self.tid, m.id, rsn, itx.user.id, int(time.time()))
+                    await conn.execute("BEGIN IMMEDIATE")
+                    await conn.executemany(
+                        _SQL_INSERT_BAN,
+                        [(self.tid, uid, rsn, itx.user.id, now) for uid in members]
                     )
+                    await self.cog._mark_drop_rows(conn, self.tid, list(members))
                     await conn.commit()
-                await self.cog.mark_drop(self.tid, m.id)
-                ok.append(m.display_name)
-            await self.cog._audit(self.tid, itx.user.id, "admin_batch_ban",
-                                  f"count={len(ok)}, reason={rsn}, not_found={len(not_found)}")
+                self.cog._ban_cache.pop(self.tid, None)
+            ok = [m.display_name for m in members.values()]
+            self.cog._audit(self.tid, itx.user.id, "admin_batch_ban",
+                            f"count={len(ok)}, reason={rsn}, not_found={len(not_found)}")
             msg = []
             msg.append(f"批量封禁完成：{len(ok)} 位")
             if ok: msg.append("已封禁並退賽： " + ", ".join(ok[:30]) + (" …" if len(ok) > 30 else ""))
             if not_found: msg.append("未辨識： " + ", ".join(not_found[:30]) + (" …" if len(not_found) > 30 else ""))
-            await itx.response.send_message("\n".join(msg), ephemeral=True)
+            await self.cog._reply(itx, "\n".join(msg))
 
     class _TestSeedModal(discord.ui.Modal, title="測試：灌入 N 位假人"):
         n = discord.ui.TextInput(label="人數 N（1~200）", placeholder="例如 8", required=True)
         def __init__(self, cog: 'SwissAll', tid: int):
             super().__init__(); self.cog = cog; self.tid = tid
         async def on_submit(self, itx: discord.Interaction):
+            await itx.response.defer(ephemeral=True, thinking=True)
             if not await self.cog._is_organizer_user(self.tid, itx.user):
-                return await itx.response.send_message("沒有權限。", ephemeral=True)
+                return await self.cog._reply(itx, "沒有權限。")
             try:
                 n = max(1, min(200, int(str(self.n))))
             except ValueError:
-                return await itx.response.send_message("請輸入 1~200 的整數。", ephemeral=True)
-            async with self.cog.db() as conn:
-                for i in range(n):
-                    fake_uid = 10_000_000 + random.randint(1, 9_999_999)
-                    name = f"測試玩家{str(i+1).zfill(2)}"
-                    await conn.execute(
-                        "INSERT OR IGNORE INTO players(tournament_id,user_id,display_name,active) VALUES(?,?,?,1)",
-                        (self.tid, fake_uid, name)
-                    )
-                await conn.commit()
-            await itx.response.send_message(f"已加入 {n} 位測試玩家。", ephemeral=True)
+                return await self.cog._reply(itx, "請輸入 1~200 的整數。")
+            # 一次抽出 n 個不重複的假 uid，避免 INSERT OR IGNORE 撞號少加
+            uids = random.sample(range(10_000_001, 20_000_000), n)
+            added = await self.cog.add_players_bulk(self.tid, [
+                (uid, f"測試玩家{i:02d}") for i, uid in enumerate(uids, 1)
+            ])
+            await self.cog._reply(itx, f"已加入 {added} 位測試玩家。")
 
     class OpenPanelView(discord.ui.View):
         """公開訊息上的按鈕；主辦/管理點擊後以臨時訊息送出管理面板。"""
@@ -1056,7 +1649,7 @@ class SwissAll(commands.Cog):
                 return await itx.response.send_message("需要主辦者或管理員權限。", ephemeral=True)
 
             # 以臨時訊息送出完整管理面板
-            await itx.response.send_message("Swiss 管理面板：", view=self.cog.PanelView(self.cog, self.tid), ephemeral=True)
+            await itx.response.send_message("Swiss 管理面板：", view=self.cog._tid_view(self.cog.PanelView, self.tid), ephemeral=True)
 
     # -------------- Organizer Panel --------------
     class PanelView(discord.ui.View):
@@ -1099,10 +1692,17 @@ class SwissAll(commands.Cog):
             else:
                 await itx.followup.send("已輸出文字排名。", ephemeral=True)
 
+        @discord.ui.button(label="重算積分", style=discord.ButtonStyle.secondary, custom_id="swiss:recompute")
+        async def btn_recompute(self, itx: discord.Interaction, button: discord.ui.Button):
+            if not await self._adm(itx): return
+            await itx.response.defer(ephemeral=True)
+            await self.cog.recompute_scores(self.tid)
+            await itx.followup.send("已依所有對局結果重新計算積分。", ephemeral=True)
+
         @discord.ui.button(label="發送報名面板", style=discord.ButtonStyle.secondary, custom_id="swiss:regpanel")
         async def btn_regpanel(self, itx: discord.Interaction, button: discord.ui.Button):
             if not await self._adm(itx): return
-            await itx.channel.send("報名/退出/退賽面板：", view=self.cog.RegView(self.cog, self.tid))
+            await itx.channel.send("報名/退出/退賽面板：", view=self.cog._tid_view(self.cog.RegView, self.tid))
             await itx.response.send_message("已發送報名面板（公開）。", ephemeral=True)
 
         # --- Roster & Registration management ---
@@ -1176,11 +1776,9 @@ class SwissAll(commands.Cog):
                 return await itx.response.send_message("沒有進行中的輪次。", ephemeral=True)
             rid, _, _ = cur
             rows = await self.cog.list_matches_round(rid)
-            filled = 0
-            for mid, _tno, p1, p2, res, _ in rows:
-                if res is None and p1 and p2:
-                    await self.cog._test_fill_for_match(mid, p1, p2)
-                    filled += 1
+            todo = [(mid, p1, p2) for mid, _tno, p1, p2, res, _ in rows if res is None and p1 and p2]
+            await self.cog._test_fill_matches(todo)
+            filled = len(todo)
             await itx.response.send_message(f"已為本輪 {filled} 桌填入兩職業與實際職業（不含 BYE/已結束）。", ephemeral=True)
 
         @discord.ui.button(label="測試：隨機結算本輪", style=discord.ButtonStyle.danger, custom_id="swiss:test:simulate")
@@ -1198,29 +1796,26 @@ class SwissAll(commands.Cog):
 
             rid, _rno, _status = cur
             rows = await self.cog.list_matches_round(rid)
-            any_done = False
-
-            for mid, tno, p1, p2, res, _ in rows:
-                if res is not None or p1 is None or p2 is None:
+            todo = [r for r in rows if r[4] is None and r[2] is not None and r[3] is not None]
+
+            await self.cog._test_fill_matches([(r[0], r[2], r[3]) for r in todo])
+            picks = {r[0]: ("p1" if random.random() < 0.5 else "p2") for r in todo}
+
+            applied = set(await self.cog.set_match_results_bulk([
+                (mid, picks[mid], p1 if picks[mid] == "p1" else p2) for mid, _tno, p1, p2, _res, _ in todo
+            ]))
+            names = await self.cog._round_names(tid, rid, [pid for r in todo for pid in (r[2], r[3])])
+            lines = []
+            for mid, tno, p1, p2, _res, _ in todo:
+                if mid not in applied:
                     continue
+                w, l = (p1, p2) if picks[mid] == "p1" else (p2, p1)
+                lines.append(f"桌 {tno}：{names.get(w, '?')} 勝 {names.get(l, '?')}(match {mid})")
+            # 合併成少數幾則訊息依序送出，不再每桌一則（每則都是一次 API 呼叫、吃同一個頻道 rate limit）
+            for ck in chunk_text("\n".join(lines)):
+                await itx.channel.send(ck)
 
-                await self.cog._test_fill_for_match(mid, p1, p2)
-
-                winner_pid = p1 if random.random() < 0.5 else p2
-                result = "p1" if winner_pid == p1 else "p2"
-
-                ok, _ = await self.cog.set_match_result_atomic(mid, result, winner_pid)
-                if ok:
-                    await self.cog.update_score_for_match(tid, p1, p2, result, winner_pid)
-                    async with self.cog.db() as conn:
-                        name1 = (await (await conn.execute("SELECT display_name FROM players WHERE id=?", (p1,))).fetchone())[0]
-                        name2 = (await (await conn.execute("SELECT display_name FROM players WHERE id=?", (p2,))).fetchone())[0]
-                    winner_name = name1 if result == "p1" else name2
-                    loser_name  = name2 if result == "p1" else name1
-                    await itx.channel.send(f"桌 {tno}：{winner_name} 勝 {loser_name}(match {mid})")
-                    any_done = True
-
-            if not any_done:
+            if not applied:
                 # ★ 這裡改成 followup
                 return await itx.followup.send("沒有可模擬的對局（可能都是 BYE 或已回報）。", ephemeral=True)
 
@@ -1248,8 +1843,8 @@ class SwissAll(commands.Cog):
             tid = await self.cog.create_tournament(self.guild_id, itx.user.id, name)
             # 管理面板→臨時給建立者；報名面板→公開
             await itx.response.send_message(f"已建立 `{name}` (ID={tid})。管理面板僅你可見。", ephemeral=True)
-            await itx.followup.send("Swiss 管理面板：", view=self.cog.PanelView(self.cog, tid), ephemeral=True)
-            await itx.channel.send("報名/退出/退賽面板：", view=self.cog.RegView(self.cog, tid))
+            await itx.followup.send("Swiss 管理面板：", view=self.cog._tid_view(self.cog.PanelView, tid), ephemeral=True)
+            await itx.channel.send("報名/退出/退賽面板：", view=self.cog._tid_view(self.cog.RegView, tid))
 
 
     # -------------- Pairing / Round flow --------------
@@ -1259,55 +1854,45 @@ class SwissAll(commands.Cog):
             await channel.send("❌ 選手不足(至少需要 2 人)。")
             return
 
-        top = max(p.score for p in players)
-        group = [p for p in players if p.score == top]
-        others = [p for p in players if p.score != top]
-        random.shuffle(group); random.shuffle(others)
+        history, had_bye = await self._collect_opponent_history(tid)
+        pairs = self._pair_by_score(players, history, had_bye)
 
-        pairs: List[Tuple[Optional[PlayerRow], Optional[PlayerRow]]] = []
-        while len(group) >= 2:
-            a, b = group.pop(), group.pop()
-            pairs.append((a, b))
-        leftovers = group[:]
-        pool = others + leftovers
-        random.shuffle(pool)
-        while len(pool) >= 2:
-            a, b = pool.pop(), pool.pop()
-            pairs.append((a, b))
-        if pool:
-            pairs.append((pool.pop(), None))  # BYE
+        rows = []
+        for table, (p1, p2) in enumerate(pairs, start=1):
+            if p1 and p2:
+                rows.append((tid, rid, table, p1.id, p2.id, None, None, None))
+            else:
+                bye = p1 or p2
+                rows.append((tid, rid, table, p1 and p1.id, p2 and p2.id, "bye", bye.id, "BYE"))
+        mids = await self.add_matches_bulk(rows)
 
         lines = ["本輪對戰表："]
-        table = 1
-
-        for p1, p2 in pairs:
+        for table, ((p1, p2), mid) in enumerate(zip(pairs, mids), start=1):
             if p1 and p2:
-                mid = await self.add_match(tid, rid, table, p1.id, p2.id)
                 lines.append(f"桌 {table}: {p1.display_name} vs {p2.display_name} (match {mid})")
-            elif p1 and not p2:
-                mid = await self.add_match(tid, rid, table, p1.id, None, result="bye", winner_player_id=p1.id, notes="BYE")
-                await self.update_score_for_match(tid, p1.id, None, "bye", p1.id)
-                lines.append(f"桌 {table}: {p1.display_name} 免戰 (BYE) (match {mid})")
-            elif p2 and not p1:
-                mid = await self.add_match(tid, rid, table, None, p2.id, result="bye", winner_player_id=p2.id, notes="BYE")
-                await self.update_score_for_match(tid, None, p2.id, "bye", p2.id)
-                lines.append(f"桌 {table}: {p2.display_name} 免戰 (BYE) (match {mid})")
-            table += 1
+            else:
+                bye = p1 or p2
+                lines.append(f"桌 {table}: {bye.display_name} 免戰 (BYE) (match {mid})")
         await channel.send("\n".join(lines))
 
+        await self._post_round_panels(channel, tid, rid)
+
+    def _round_views(self, tid: int, rid: int) -> Tuple[discord.ui.View, ...]:
+        views = self._round_view_cache.get((tid, rid))
+        if views is None:
+            views = self._round_view_cache[(tid, rid)] = (
+                self.RoundDeckView(self, tid, rid),
+                self.RoundWinnerView(self, tid, rid),
+                self.RoundActualView(self, tid, rid),
+            )
+        return views
+
+    async def _post_round_panels(self, channel: discord.abc.Messageable, tid: int, rid: int):
         # ✅ 每輪只送三則面板訊息(更不擁擠)
-        await channel.send(
-            "本輪回報面板：使用的雙職業",
-            view=self.RoundDeckView(self, tid, rid)
-        )
-        await channel.send(
-            "本輪回報面板(2/3)\n勝者請點以下按鈕",
-            view=self.RoundWinnerView(self, tid, rid)
-        )
-        await channel.send(
-            "本輪回報面板(3/3)\n使用職業(不管輸贏都需要填寫)",
-            view=self.RoundActualView(self, tid, rid)
-        )
+        deck, winner, actual = self._round_views(tid, rid)
+        await channel.send("本輪回報面板：使用的雙職業", view=deck)
+        await channel.send("本輪回報面板(2/3)\n勝者請點以下按鈕", view=winner)
+        await channel.send("本輪回報面板(3/3)\n使用職業(不管輸贏都需要填寫)", view=actual)
 
     # -------------- Standings & tiebreaks --------------
     async def compute_standings(self, tid: int, active_only=True):
@@ -1322,18 +1907,37 @@ class SwissAll(commands.Cog):
         - OPPT1 = 0.26123 + 0.004312*MP - 0.007638*SOS + 0.003810*SOSS + 0.23119*OppMW
         排序：Pts → OppMW → name
         """
-        async with self.db() as conn:
-            async with conn.execute(
+        async with self.db_read() as conn:
+            prow = await conn.execute_fetchall(
                 "SELECT id,user_id,display_name,active,score FROM players WHERE tournament_id=?",
                 (tid,),
-            ) as cur:
-                prow = await cur.fetchall()
-            async with conn.execute(
-                "SELECT id, round_id, p1_id, p2_id, result, winner_player_id "
-                "FROM matches WHERE tournament_id=?",
+            )
+            # 勝場/場數直接在 SQL 彙總：一般對局兩側各算一場；BYE 只在判得出得分者時算一勝一場
+            record = {r[0]: (r[1], r[2]) for r in await conn.execute_fetchall(
+                """
+                WITH decided AS (
+                    SELECT p1_id, p2_id, result, winner_player_id FROM matches
+                    WHERE tournament_id=? AND result IS NOT NULL
+                ), seats(pid, won) AS (
+                    SELECT p1_id, winner_player_id IS p1_id FROM decided
+                    WHERE p1_id IS NOT NULL AND p2_id IS NOT NULL
+                    UNION ALL
+                    SELECT p2_id, winner_player_id IS p2_id FROM decided
+                    WHERE p1_id IS NOT NULL AND p2_id IS NOT NULL
+                    UNION ALL
+                    SELECT COALESCE(p1_id, p2_id), 1 FROM decided
+                    WHERE (p1_id IS NULL) <> (p2_id IS NULL)
+                      AND result IN ('bye', CASE WHEN p2_id IS NULL THEN 'p1' ELSE 'p2' END)
+                )
+                SELECT pid, SUM(won), COUNT(*) FROM seats GROUP BY pid
+                """,
                 (tid,),
-            ) as cur:
-                mrows = await cur.fetchall()
+            )}
+            pairs = await conn.execute_fetchall(
+                "SELECT p1_id, p2_id FROM matches "
+                "WHERE tournament_id=? AND result IS NOT NULL AND p1_id IS NOT NULL AND p2_id IS NOT NULL",
+                (tid,),
+            )
 
         players = {
             r[0]: {
@@ -1342,48 +1946,34 @@ class SwissAll(commands.Cog):
                 "name": r[2],
                 "active": r[3],
                 "Pts": float(r[4]),
-                "wins": 0,
-                "played": 0,
+                "wins": record.get(r[0], (0, 0))[0],
+                "played": record.get(r[0], (0, 0))[1],
                 "opp_pids": set(),
             }
             for r in prow
         }
 
-        for mid, rid, p1, p2, res, wpid in mrows:
-            is_bye = (p1 is None) ^ (p2 is None)
-            if res is None:
-                continue
-            if is_bye:
-                winner = p1 if (p1 is not None and (res == "p1" or (res == "bye"))) else (
-                        p2 if (p2 is not None and (res == "p2" or (res == "bye"))) else None)
-                if winner in players:
-                    players[winner]["wins"] += 1
-                    players[winner]["played"] += 1
-                continue
-            if p1 in players: players[p1]["played"] += 1
-            if p2 in players: players[p2]["played"] += 1
-            if wpid in players: players[wpid]["wins"] += 1
+        for p1, p2 in pairs:
             if p1 in players and p2 in players:
                 players[p1]["opp_pids"].add(p2)
                 players[p2]["opp_pids"].add(p1)
 
-        for p in players.values():
-            p["MWP"] = (p["wins"] / p["played"]) if p["played"] > 0 else 0.0
-
-        def _pts(pid: int) -> float: return players[pid]["Pts"] if pid in players else 0.0
-        def _mwp(pid: int) -> float: return players[pid]["MWP"] if pid in players else 0.0
-
-        for p in players.values():
-            opps = [players[op] for op in p["opp_pids"] if op in players]
-            p["OppMW"] = (sum(_mwp(op["pid"]) for op in opps) / len(opps)) if opps else 0.0
-            p["SOS"] = sum(_pts(op["pid"]) for op in opps)
-            soss_sum = 0.0
-            for op in opps:
-                for op2 in op["opp_pids"]:
-                    if op2 == p["pid"]: continue
-                    soss_sum += _pts(op2)
-            p["SOSS"] = soss_sum
-            MP = p["Pts"]; SOS = p["SOS"]; SOSS = p["SOSS"]; OMW = p["OppMW"]
+        # 依 dense index 攤平成 list，後面只做 list 索引，不再逐次查 dict
+        plist = list(players.values())
+        idx = {p["pid"]: i for i, p in enumerate(plist)}
+        pts = [p["Pts"] for p in plist]
+        mwp = [(p["wins"] / p["played"]) if p["played"] > 0 else 0.0 for p in plist]
+        adj = [[idx[op] for op in p["opp_pids"]] for p in plist]
+        sos = [sum(pts[j] for j in a) for a in adj]
+
+        for i, p in enumerate(plist):
+            a = adj[i]
+            p["MWP"] = mwp[i]
+            p["OppMW"] = (sum(mwp[j] for j in a) / len(a)) if a else 0.0
+            p["SOS"] = sos[i]
+            # 對手的對手總分 = Σ 各對手的 SOS − 自己被各對手算進去的那份
+            p["SOSS"] = sum(sos[j] for j in a) - len(a) * pts[i]
+            MP = pts[i]; SOS = p["SOS"]; SOSS = p["SOSS"]; OMW = p["OppMW"]
             p["OPPT1"] = 0.26123 + 0.004312 * MP - 0.007638 * SOS + 0.003810 * SOSS + 0.23119 * OMW
 
         ordered = sorted(
@@ -1415,45 +2005,22 @@ class SwissAll(commands.Cog):
             [r["Pos"], r["Player"], r["Pts"], r["MWP"], r["OppMW"], round(r.get("OPPT1", 0.0), 4)]
             for r in rows
         ]
+        if len(table) <= STANDINGS_TEXT_MAX_ROWS:
+            await channel.send("目前積分：\n```\n" + _format_text_table(headers, table) + "\n```")
+            return None
         try:
-            import os
-            import matplotlib
-            import matplotlib.pyplot as plt
-            from matplotlib import font_manager
-
-            matplotlib.rcParams["axes.unicode_minus"] = False
-
-            def _pick_cjk_font() -> "matplotlib.font_manager.FontProperties":
-                env_path = os.getenv("SWISS_CJK_FONT")
-                if env_path and os.path.isfile(env_path):
-                    return font_manager.FontProperties(fname=env_path)
-                candidates = [
-                    "Microsoft JhengHei", "Microsoft YaHei", "SimHei", "PMingLiU", "MingLiU",
-                    "PingFang TC", "PingFang SC", "Hiragino Sans",
-                    "Noto Sans CJK TC", "Noto Sans CJK SC", "Noto Sans CJK JP",
-                    "Noto Sans TC", "Source Han Sans TW", "Source Han Sans SC", "Source Han Sans JP",
-                ]
-                for name in candidates:
-                    try:
-                        path = font_manager.findfont(name, fallback_to_default=False)
-                        if os.path.isfile(path):
-                            return font_manager.FontProperties(fname=path)
-                    except Exception:
-                        continue
-                return font_manager.FontProperties()
-
-            fp = _pick_cjk_font()
-            fig, ax = plt.subplots(figsize=(10, min(0.6 * max(4, len(table)), 20)))
-            ax.axis("off")
-            tbl = ax.table(cellText=table, colLabels=headers, cellLoc="center", loc="upper left")
-            tbl.auto_set_font_size(False); tbl.set_fontsize(9); tbl.scale(1, 1.2)
-            for cell in tbl.get_celld().values():
-                cell.get_text().set_fontproperties(fp)
-            buf = io.BytesIO()
-            fig.savefig(buf, format="png", dpi=200, bbox_inches="tight")
-            plt.close(fig)
-            buf.seek(0)
-            return discord.File(buf, filename="standings.png")
+            if Figure is None and ImageFont is None:
+                raise ImportError("Pillow / matplotlib")
+            key = tuple(map(tuple, table))
+            png = self._png_cache.get(key)
+            if png is None:
+                png = await asyncio.to_thread(self._render_standings_png_sync, table, headers)
+                self._png_cache[key] = png
+                if len(self._png_cache) > STANDINGS_PNG_CACHE_SIZE:
+                    self._png_cache.popitem(last=False)
+            else:
+                self._png_cache.move_to_end(key)
+            return discord.File(io.BytesIO(png), filename="standings.png")
         except Exception:
             lines = ["目前積分：", "```"]
             lines.append("\t".join(headers))
@@ -1464,37 +2031,112 @@ class SwissAll(commands.Cog):
                 await channel.send(ck)
             return None
 
+    def _render_standings_png_sync(self, table: List[list], headers: List[str]) -> bytes:
+        """在 worker thread 執行：只吃純資料，回傳 PNG bytes。有 Pillow 與中文字型時直接畫，否則用 matplotlib。"""
+        font = _pil_cjk_font()
+        with self._render_lock:
+            if font is not None:
+                return self._render_png_pil(font, table, headers)
+            if Figure is None:
+                raise ImportError("matplotlib")
+            return self._render_png_mpl(table, headers)
+
+    @staticmethod
+    def _render_png_pil(font: "ImageFont.FreeTypeFont", table: List[list], headers: List[str]) -> bytes:
+        pad_x, pad_y = 12, 6
+        cells = [[str(x) for x in headers]] + [[str(x) for x in row] for row in table]
+        col_w = [
+            int(max(font.getlength(r[c]) for r in cells)) + 2 * pad_x
+            for c in range(len(headers))
+        ]
+        ascent, descent = font.getmetrics()
+        row_h = ascent + descent + 2 * pad_y
+        W = sum(col_w) + 1
+        H = row_h * len(cells) + 1
+        img = Image.new("RGB", (W, H), "white")
+        draw = ImageDraw.Draw(img)
+        draw.rectangle((0, 0, W - 1, row_h), fill=(235, 235, 235))
+        y = 0
+        for r in cells:
+            x = 0
+            for c, text in enumerate(r):
+                tx = x + (col_w[c] - font.getlength(text)) / 2
+                draw.text((tx, y + pad_y), text, fill="black", font=font)
+                x += col_w[c]
+            y += row_h
+        # 格線
+        for k in range(len(cells) + 1):
+            draw.line((0, k * row_h, W - 1, k * row_h), fill="black")
+        x = 0
+        for w in col_w + [0]:
+            draw.line((x, 0, x, H - 1), fill="black")
+            x += w
+        buf = io.BytesIO()
+        img.save(buf, "PNG", optimize=False, compress_level=1)
+        return buf.getvalue()
+
+    def _render_png_mpl(self, table: List[list], headers: List[str]) -> bytes:
+        fp = _pick_cjk_font()
+        if self._fig is None:
+            # 不經 pyplot：不進全域 figure 管理，也不需 close
+            self._fig = Figure()
+            self._ax = self._fig.add_subplot()
+        fig, ax = self._fig, self._ax
+        ax.clear()
+        fig.set_size_inches(10, min(0.6 * max(4, len(table)), 20))
+        ax.axis("off")
+        tbl = ax.table(cellText=table, colLabels=headers, cellLoc="center", loc="upper left")
+        tbl.auto_set_font_size(False); tbl.set_fontsize(9); tbl.scale(1, 1.2)
+        for cell in tbl.get_celld().values():
+            cell.get_text().set_fontproperties(fp)
+        buf = io.BytesIO()
+        # Discord 會縮放顯示，dpi 120 已足夠；zlib 用最低壓縮等級換速度
+        fig.savefig(buf, format="png", dpi=120, bbox_inches="tight",
+                    pil_kwargs={"compress_level": 1, "optimize": False})
+        return buf.getvalue()
+
     # -------------- Round complete hook --------------
     async def _maybe_on_round_complete(self, tid: int, rid: int, channel: discord.abc.Messageable):
-        rows = await self.list_matches_round(rid)
-        if any(r[4] is None for r in rows):  # 尚有未回報
+        if await self.round_has_pending(rid):  # 尚有未回報
             return
-        await self.close_round(rid)
+        if not await self.close_round(rid):
+            return
+        # 收尾（同步 meta、重算、排名圖）可能超過互動回應時限，丟到背景做
+        task = asyncio.create_task(self._finalize_round(tid, rid, channel))
+        self._bg_tasks.add(task)
+        task.add_done_callback(self._bg_tasks.discard)
+
+    async def _finalize_round(self, tid: int, rid: int, channel: discord.abc.Messageable):
+        try:
+            await self._finalize_round_inner(tid, rid, channel)
+        except Exception:
+            # 輪次已 close_round，不會再自動收尾；留完整 traceback 並通知頻道
+            log.exception("finalize round %s (tournament %s) failed", rid, tid)
+            try:
+                await channel.send("⚠️ 本輪收尾失敗（積分/排名可能未更新）。請主辦按「重算積分」，並查看積分表後再繼續。")
+            except discord.HTTPException:
+                pass
+
+    async def _finalize_round_inner(self, tid: int, rid: int, channel: discord.abc.Messageable):
         await self._sync_round_meta_to_players(rid)
         await self.recompute_scores(tid)
 
         status = await self.tour_status(tid)
 
-        async def _pid_name(pid: Optional[int]) -> str:
-            if pid is None: return "?"
-            async with self.db() as conn:
-                async with conn.execute("SELECT display_name FROM players WHERE id=?", (pid,)) as c:
-                    r = await c.fetchone()
-                    return r[0] if r else str(pid)
-
         if status == "top4_finals":
-            final_row = next((r for r in rows if r[1] == 1), None)
-            third_row = next((r for r in rows if r[1] == 2), None)
+            rows = await self.list_matches_round(rid)
+            by_table = {r[1]: r for r in rows}
+            final_row = by_table.get(1)
+            third_row = by_table.get(2)
             if not final_row or not third_row:
-                async with self.db() as conn:
-                    async with conn.execute(
-                        "SELECT id,table_no,p1_id,p2_id,result,winner_player_id,notes FROM matches WHERE round_id=?",
+                async with self.db_read() as conn:
+                    by_notes = {r[0]: r[1:] for r in await conn.execute_fetchall(
+                        "SELECT notes,id,table_no,p1_id,p2_id,result,winner_player_id FROM matches "
+                        "WHERE round_id=? AND notes IN ('FINAL','THIRD')",
                         (rid,)
-                    ) as cur:
-                        m2 = await cur.fetchall()
-                for r in m2:
-                    if r[6] == "FINAL":  final_row = r[:6]
-                    if r[6] == "THIRD":  third_row = r[:6]
+                    )}
+                final_row = by_notes.get("FINAL", final_row)
+                third_row = by_notes.get("THIRD", third_row)
 
             if not final_row or not third_row:
                 await channel.send("⚠️ 找不到決賽或季軍戰的對局資訊，請檢查回報。")
@@ -1502,20 +2144,21 @@ class SwissAll(commands.Cog):
 
             _, _, f_p1, f_p2, _, f_wpid = final_row
             _, _, t_p1, t_p2, _, t_wpid = third_row
+            if f_wpid is None or f_wpid not in (f_p1, f_p2) or t_wpid is None or t_wpid not in (t_p1, t_p2):
+                await channel.send("⚠️ 決賽或季軍戰勝者未回報，請檢查回報。")
+                return
 
             first_pid  = f_wpid
             second_pid = f_p2 if f_wpid == f_p1 else f_p1
             third_pid  = t_wpid
             fourth_pid = t_p2 if t_wpid == t_p1 else t_p1
 
-            n1 = await _pid_name(first_pid)
-            n2 = await _pid_name(second_pid)
-            n3 = await _pid_name(third_pid)
-            n4 = await _pid_name(fourth_pid)
+            placed = (first_pid, second_pid, third_pid, fourth_pid)
+            name_of = await self._names_by_pid(list(placed))
+            n1, n2, n3, n4 = ("?" if pid is None else name_of.get(pid, str(pid)) for pid in placed)
 
+            # 選職同步與積分重算已在本函式開頭做過，這裡只改狀態
             await self.set_status(tid, "finished")
-            await self._sync_round_meta_to_players(rid)
-            await self.recompute_scores(tid)
             await channel.send(
                 "本賽事結束！最終名次：\n"
                 f"第一名：{n1}\n"
@@ -1546,23 +2189,17 @@ class SwissAll(commands.Cog):
             await itx_or_ctx.send(content)
 
     async def _sync_round_meta_to_players(self, rid: int):
+        """把本輪各桌的 pick/actual 一次寫回 players（單一 UPDATE…FROM）。"""
         async with self.db() as conn:
-            async with conn.execute("SELECT id, p1_id, p2_id FROM matches WHERE round_id=?", (rid,)) as cur:
-                matches = await cur.fetchall()
-            for mid, p1, p2 in matches:
-                for pid in (p1, p2):
-                    if not pid: continue
-                    async with conn.execute(
-                        "SELECT pick1, pick2, actual FROM match_player_meta WHERE match_id=? AND player_id=?",
-                        (mid, pid)
-                    ) as c2:
-                        meta = await c2.fetchone()
-                    if meta:
-                        pick1, pick2, actual = meta
-                        await conn.execute(
-                            "UPDATE players SET deck1=?, deck2=?, actual_class=? WHERE id=?",
-                            (pick1, pick2, actual, pid)
-                        )
+            await conn.execute(
+                """
+                UPDATE players SET deck1=mpm.pick1, deck2=mpm.pick2, actual_class=mpm.actual
+                FROM match_player_meta AS mpm JOIN matches AS m ON m.id=mpm.match_id
+                WHERE m.round_id=? AND mpm.player_id=players.id
+                  AND players.id IN (m.p1_id, m.p2_id)
+                """,
+                (rid,),
+            )
             await conn.commit()
 
     async def cmd_start_round(self, itx_or_ctx, tid: int):
@@ -1586,8 +2223,7 @@ class SwissAll(commands.Cog):
             return await self._reply(itx_or_ctx, "目前非瑞士輪狀態。")
         cur = await self.current_round(tid)
         if cur and cur[2] == "ongoing":
-            rows = await self.list_matches_round(cur[0])
-            if any(r[4] is None for r in rows):
+            if await self.round_has_pending(cur[0]):
                 return await self._reply(itx_or_ctx, "仍有對局未回報，無法進入下一輪。")
             await self.close_round(cur[0])
         players = await self.fetch_players(tid, active_only=True)
@@ -1609,8 +2245,10 @@ class SwissAll(commands.Cog):
             return await self._reply(itx_or_ctx, "需要至少 4 位有效選手才能建立決賽與季軍戰。")
         top4 = standings[:4]
         rid = await self.create_round(tid)
-        mf = await self.add_match(tid, rid, 1, top4[0]["pid"], top4[1]["pid"], notes="FINAL")
-        m3 = await self.add_match(tid, rid, 2, top4[2]["pid"], top4[3]["pid"], notes="THIRD")
+        mf, m3 = await self.add_matches_bulk([
+            (tid, rid, 1, top4[0]["pid"], top4[1]["pid"], None, None, "FINAL"),
+            (tid, rid, 2, top4[2]["pid"], top4[3]["pid"], None, None, "THIRD"),
+        ])
         await self.set_status(tid, "top4_finals")
         ch = itx_or_ctx.channel if isinstance(itx_or_ctx, (discord.Interaction, commands.Context)) else itx_or_ctx
         await ch.send(
@@ -1618,39 +2256,32 @@ class SwissAll(commands.Cog):
             f"決賽：{top4[0]['name']} vs {top4[1]['name']} (match {mf})\n"
             f"季軍戰：{top4[2]['name']} vs {top4[3]['name']} (match {m3})"
         )
-        await ch.send("本輪回報面板：使用雙職業", view=self.RoundDeckView(self, tid, rid))
-        await ch.send("本輪回報面板(2/3)\n勝者請點以下按鈕", view=self.RoundWinnerView(self, tid, rid))
-        await ch.send("本輪回報面板(3/3)\n使用職業(不管輸贏都需要填寫)", view=self.RoundActualView(self, tid, rid))
+        await self._post_round_panels(ch, tid, rid)
 
     async def ui_show_me(self, itx: discord.Interaction, tid: int, member: discord.Member):
-        async with self.db() as conn:
+        async with self.db_read() as conn:
             async with conn.execute(
                 "SELECT id,display_name,score,deck1,deck2,actual_class FROM players WHERE tournament_id=? AND user_id=?",
                 (tid, member.id),
             ) as cur:
                 row = await cur.fetchone()
+            if row:
+                # 對手名稱直接 JOIN 帶回，免得每位對手各查一次
+                q = (
+                    "SELECT r.round_no, m.table_no, CASE WHEN m.p1_id=?1 THEN m.p2_id ELSE m.p1_id END AS opp_pid, "
+                    "m.result, m.winner_player_id, m.id, op.display_name "
+                    "FROM matches m JOIN rounds r ON m.round_id=r.id "
+                    "LEFT JOIN players op ON op.id = CASE WHEN m.p1_id=?1 THEN m.p2_id ELSE m.p1_id END "
+                    "WHERE m.tournament_id=?2 AND (m.p1_id=?1 OR m.p2_id=?1) ORDER BY r.round_no, m.table_no"
+                )
+                rows = await conn.execute_fetchall(q, (row[0], tid))
         if not row:
             return await itx.response.send_message("你不在本賽事名單中。", ephemeral=True)
         pid, dname, score, deck1, deck2, actual = row
-        async with self.db() as conn:
-            q = (
-                "SELECT r.round_no, m.table_no, CASE WHEN m.p1_id=? THEN m.p2_id ELSE m.p1_id END AS opp_pid, "
-                "m.result, m.winner_player_id, m.id "
-                "FROM matches m JOIN rounds r ON m.round_id=r.id "
-                "WHERE m.tournament_id=? AND (m.p1_id=? OR m.p2_id=?) ORDER BY r.round_no, m.table_no"
-            )
-            async with conn.execute(q, (pid, tid, pid, pid)) as cur:
-                rows = await cur.fetchall()
 
-        opp_name: Dict[int, str] = {}
         details = []
-        for rno, tno, opp_pid, res, wpid, mid in rows:
-            if opp_pid and opp_pid not in opp_name:
-                async with self.db() as conn:
-                    async with conn.execute("SELECT display_name FROM players WHERE id=?", (opp_pid,)) as c2:
-                        rr = await c2.fetchone()
-                        opp_name[opp_pid] = rr[0] if rr else str(opp_pid)
-            opp = "BYE" if opp_pid is None else opp_name.get(opp_pid, str(opp_pid))
+        for rno, tno, opp_pid, res, wpid, mid, oname in rows:
+            opp = "BYE" if opp_pid is None else (oname or str(opp_pid))
             if res == "bye":
                 you = "Win"
             elif res in ("p1", "p2"):
@@ -1664,16 +2295,25 @@ class SwissAll(commands.Cog):
             break
 
     # -------------- Test helper --------------
-    async def _test_fill_for_match(self, mid: int, p1: Optional[int], p2: Optional[int]):
-        async def _fill_player(pid: Optional[int]):
-            if not pid:
-                return
-            picks = random.sample(CLASS_LABELS, 2)
-            actual = random.choice(picks)
-            await self._mpm_upsert(mid, pid, pick1=picks[0], pick2=picks[1], actual=actual)
-            await self._player_set_decks_if_ready(pid, picks[0], picks[1], actual)
-        await _fill_player(p1)
-        await _fill_player(p2)
+    @staticmethod
+    def _pick_meta() -> Tuple[str, str, str]:
+        """隨機兩個不同職業 + 其中之一為實際職業。"""
+        pick1, pick2 = random.sample(CLASS_LABELS, 2)
+        return pick1, pick2, random.choice((pick1, pick2))
+
+    async def _test_fill_matches(self, matches: List[Tuple[int, Optional[int], Optional[int]]]):
+        """matches: [(match_id, p1_id, p2_id)]；先在 Python 抽好職業，再一次交易寫入 meta 與 players。"""
+        rows = [(mid, pid, *self._pick_meta()) for mid, p1, p2 in matches for pid in (p1, p2) if pid]
+        if not rows:
+            return
+        async with self.db_write() as conn:
+            await conn.execute("BEGIN IMMEDIATE")
+            await conn.executemany(_MPM_UPSERT_SQL[_MPM_COLS], rows)
+            await conn.executemany(
+                _SQL_SET_PLAYER_DECKS,
+                [(pick1, pick2, actual, pid) for _mid, pid, pick1, pick2, actual in rows]
+            )
+            await conn.commit()
 
     # -------------- Commands (only one: !swiss) --------------
     @commands.group(name="swiss", invoke_without_command=True)
@@ -1685,16 +2325,33 @@ class SwissAll(commands.Cog):
 
         if not tid:
             # 不再限制管理員：任何人都可見並可建立
-            await ctx.send("Swiss 前置控制面板（尚未建立賽事）：", view=self.BootView(self, gid))
-            return
+            content = "Swiss 前置控制面板（尚未建立賽事）："
+            view = self._boot_views.get(gid)
+            if view is None:
+                view = self._boot_views[gid] = self.BootView(self, gid)
+        else:
+            # 已有賽事：公開訊息 + 按鈕；面板權限由 _is_organizer_user 控制（發起人/管理員/擁有者）
+            content = (
+                f"Swiss 控制：目前賽事 ID={tid}\n"
+                "－ 主辦/管理/伺服器擁有者可按下方按鈕，以**臨時訊息**開啟管理面板。\n"
+                "－ 一般選手請使用公開的報名面板進行報名/退賽。"
+            )
+            view = self._tid_view(self.OpenPanelView, tid)
+        await self._send_or_edit_panel(ctx.channel, gid, content, view)
+
+    async def _send_or_edit_panel(self, channel: discord.abc.Messageable, gid: int, content: str, view: discord.ui.View):
+        """每個伺服器只保留一則控制訊息：找得到就編輯，找不到（已刪除/換頻道）才重發。"""
+        mid = self._panel_msg.get(gid)
+        if mid:
+            try:
+                msg = await channel.fetch_message(mid)
+                await msg.edit(content=content, view=view)
+                return
+            except (discord.NotFound, discord.Forbidden):
+                pass
+        msg = await channel.send(content, view=view)
+        self._panel_msg[gid] = msg.id
 
-        # 已有賽事：公開訊息 + 按鈕；面板權限由 _is_organizer_user 控制（發起人/管理員/擁有者）
-        await ctx.send(
-            f"Swiss 控制：目前賽事 ID={tid}\n"
-            "－ 主辦/管理/伺服器擁有者可按下方按鈕，以**臨時訊息**開啟管理面板。\n"
-            "－ 一般選手請使用公開的報名面板進行報名/退賽。",
-            view=self.OpenPanelView(self, tid)
-        )
     # ---------- Bulk swap helpers ----------
     async def _clear_match_state(self, match_id: int):
         """清空對局的回報與職業資訊"""
@@ -1703,21 +2360,72 @@ class SwissAll(commands.Cog):
                 "UPDATE matches SET result=NULL, winner_player_id=NULL, notes=COALESCE(notes,'') || ';ADMIN:swap_override' WHERE id=?",
                 (match_id,)
             )
-            await conn.execute("DELETE FROM match_player_meta WHERE match_id=?", (match_id,))
+            await conn.execute(_SQL_CLEAR_MATCH_META, (match_id,))
             await conn.commit()
 
-    async def _collect_opponent_history(self, tid: int) -> Dict[int, set]:
-        """回傳 {pid: set(對手pid)}（不含 BYE）"""
+    async def _collect_opponent_history(self, tid: int) -> Tuple[Dict[int, set], set]:
+        """回傳 ({pid: set(對手pid)}（不含 BYE）, 拿過 BYE 的 pid 集合)"""
         history: Dict[int, set] = {}
-        async with self.db() as conn:
+        had_bye: set = set()
+        async with self.db_read() as conn:
             async with conn.execute(
-                "SELECT p1_id, p2_id FROM matches WHERE tournament_id=? AND p1_id IS NOT NULL AND p2_id IS NOT NULL",
+                "SELECT p1_id, p2_id FROM matches WHERE tournament_id=? AND (p1_id IS NOT NULL OR p2_id IS NOT NULL)",
                 (tid,)
             ) as cur:
                 for p1, p2 in await cur.fetchall():
+                    if p1 is None or p2 is None:
+                        had_bye.add(p1 if p2 is None else p2)
+                        continue
                     history.setdefault(p1, set()).add(p2)
                     history.setdefault(p2, set()).add(p1)
-        return history
+        return history, had_bye
+
+    @staticmethod
+    def _pair_by_score(players: List[PlayerRow], history: Dict[int, set], had_bye: set) -> List[Tuple[Optional[PlayerRow], Optional[PlayerRow]]]:
+        """
+        依積分由高到低配對：深度優先搜尋，每人先試分數最接近、且沒對過的對手，走不通就回溯。
+        重複對戰只在整體找不到零重複配對時才允許，且盡量少。
+        人數為奇數時，BYE 給排名最低、且還沒拿過 BYE 的人（全都拿過就給最後一名）。
+        同分者順序隨機。
+        """
+        pool = sorted(players, key=lambda p: (-p.score, random.random()))
+        bye = None
+        if len(pool) % 2:
+            k = next((k for k in range(len(pool) - 1, -1, -1) if pool[k].id not in had_bye), len(pool) - 1)
+            bye = pool.pop(k)
+
+        steps = [PAIR_SEARCH_STEPS]
+
+        def dfs(rest: List[PlayerRow], budget: int) -> Optional[List[Tuple[PlayerRow, PlayerRow]]]:
+            # budget：本分支還能容許的重複對戰數
+            if not rest:
+                return []
+            a, rest = rest[0], rest[1:]
+            seen = history.get(a.id, ())
+            order = [j for j, b in enumerate(rest) if b.id not in seen]
+            if budget:
+                order += [j for j, b in enumerate(rest) if b.id in seen]
+            for j in order:
+                steps[0] -= 1
+                if steps[0] < 0:
+                    return None
+                sub = dfs(rest[:j] + rest[j + 1:], budget - (rest[j].id in seen))
+                if sub is not None:
+                    return [(a, rest[j])] + sub
+            return None
+
+        pairs: Optional[List[Tuple[Optional[PlayerRow], Optional[PlayerRow]]]] = None
+        # 從 0 次重複開始逐步放寬；步數用完時改為不限重複（第一條路徑必定成功）
+        for budget in range(len(pool) // 2 + 1):
+            pairs = dfs(pool, budget)
+            if pairs is not None or steps[0] < 0:
+                break
+        if pairs is None:
+            steps[0] = len(pool)
+            pairs = dfs(pool, len(pool) // 2)
+        if bye is not None:
+            pairs.append((bye, None))
+        return pairs
 
     def _pair_bucket_avoid_repeats(self, bucket: List[PlayerRow], history: Dict[int, set]) -> List[Tuple[Optional[PlayerRow], Optional[PlayerRow]]]:
         """同分 bucket 內盡量避免重複對戰；退化時允許重複。"""
@@ -1773,12 +2481,11 @@ class SwissAll(commands.Cog):
                 return await itx.response.send_message("請輸入有效桌號。", ephemeral=True)
 
             # 抓本輪所有對局資訊
-            async with self.cog.db() as conn:
-                async with conn.execute(
+            async with self.cog.db_read() as conn:
+                rows = await conn.execute_fetchall(
                     "SELECT id, table_no, p1_id, p2_id, result FROM matches WHERE round_id=? ORDER BY table_no",
                     (rid,)
-                ) as cur2:
-                    rows = await cur2.fetchall()
+                )
 
             by_table = {t: r for (r, t) in [((mid, tno, p1, p2, res), tno) for (mid, tno, p1, p2, res) in rows]}
             targets = [by_table.get(t) for t in tnos if t in by_table]
@@ -1793,12 +2500,8 @@ class SwissAll(commands.Cog):
             candidates = list(dict.fromkeys(candidates))  # 去重
 
             # 映射 pid -> name
-            names = {}
-            async with self.cog.db() as conn:
-                for pid in candidates:
-                    async with conn.execute("SELECT display_name FROM players WHERE id=?", (pid,)) as c:
-                        r = await c.fetchone()
-                        names[pid] = r[0] if r else str(pid)
+            found = await self.cog._round_names(self.tid, rid, candidates)
+            names = {pid: found.get(pid, str(pid)) for pid in candidates}
 
             view = self.cog.BulkSwapView(self.cog, self.tid, rid, targets, candidates, names)
             await itx.response.send_message("黑箱換對手：請選擇每桌左右兩側的新玩家（預設不變）。", view=view, ephemeral=True)
@@ -1870,13 +2573,15 @@ class SwissAll(commands.Cog):
             used = set()
             # 先讀舊值
             old_map = {}
-            async with self.cog.db() as conn:
-                for mid in selections.keys():
-                    async with conn.execute("SELECT p1_id,p2_id FROM matches WHERE id=?", (mid,)) as c:
-                        r = await c.fetchone()
-                    if not r:
+            if selections:
+                mids = list(selections.keys())
+                qmarks = ",".join("?" * len(mids))
+                async with self.cog.db_read() as conn:
+                    rows = await conn.execute_fetchall(f"SELECT id,p1_id,p2_id FROM matches WHERE id IN ({qmarks})", mids)
+                old_map = {r[0]: (r[1], r[2]) for r in rows}
+                for mid in mids:
+                    if mid not in old_map:
                         return await itx.response.send_message(f"找不到 match {mid}。", ephemeral=True)
-                    old_map[mid] = (r[0], r[1])
 
             for mid, info in selections.items():
                 old_p1, old_p2 = old_map[mid]
@@ -1921,25 +2626,30 @@ class SwissAll(commands.Cog):
         async with self._lock:
             changed = False
             async with self.db() as conn:
-                await conn.execute("BEGIN")
+                await conn.execute("BEGIN IMMEDIATE")
                 try:
-                    for mid, _tno, np1, np2 in plans:
-                        # 寫入新兩側
-                        await conn.execute("UPDATE matches SET p1_id=?, p2_id=? WHERE id=?", (np1, np2, mid))
-                        # 強制清空回報與職業
-                        await conn.execute("UPDATE matches SET result=NULL, winner_player_id=NULL, notes=COALESCE(notes,'') || ';ADMIN:swap_override' WHERE id=?", (mid,))
-                        await conn.execute("DELETE FROM match_player_meta WHERE match_id=?", (mid,))
+                    if plans:
+                        # 寫入新兩側並強制清空回報；一桌一列，同一條 UPDATE 完成
+                        await conn.executemany(
+                            "UPDATE matches SET p1_id=?, p2_id=?, result=NULL, winner_player_id=NULL, "
+                            "notes=COALESCE(notes,'') || ';ADMIN:swap_override' WHERE id=?",
+                            [(np1, np2, mid) for mid, _tno, np1, np2 in plans],
+                        )
+                        await conn.executemany(
+                            _SQL_CLEAR_MATCH_META,
+                            [(mid,) for mid, _tno, _np1, _np2 in plans],
+                        )
                         changed = True
+                        await self.recompute_scores(tid, conn)
                     await conn.commit()
                 except Exception:
                     await conn.execute("ROLLBACK")
                     raise
 
         if changed:
-            await self.recompute_scores(tid)
             # 審計
             payload = ";".join([f"mid={mid},p1={np1},p2={np2}" for (mid, _tno, np1, np2) in plans])
-            await self._audit(tid, actor_uid, "admin_bulk_swap", payload)
+            self._audit(tid, actor_uid, "admin_bulk_swap", payload)
         return changed
 
     class _DeleteTournamentModal(discord.ui.Modal, title="刪除賽事（不可復原）"):
@@ -1954,9 +2664,8 @@ class SwissAll(commands.Cog):
                 return await itx.response.send_message("確認字串錯誤，已取消。", ephemeral=True)
 
             async with self.cog.db() as conn:
-                await conn.execute("BEGIN")
+                await conn.execute("BEGIN IMMEDIATE")
                 try:
-                    await conn.execute("DELETE FROM match_player_meta WHERE match_id IN (SELECT id FROM matches WHERE tournament_id=?)", (self.tid,))
                     await conn.execute("DELETE FROM matches WHERE tournament_id=?", (self.tid,))
                     await conn.execute("DELETE FROM rounds WHERE tournament_id=?", (self.tid,))
                     await conn.execute("DELETE FROM tournament_bans WHERE tournament_id=?", (self.tid,))
@@ -1967,8 +2676,9 @@ class SwissAll(commands.Cog):
                 except Exception:
                     await conn.execute("ROLLBACK")
                     raise
+            self.cog._forget_tournament(self.tid)
 
-            await self.cog._audit(self.tid, itx.user.id, "admin_delete_tournament", "DELETE")
+            self.cog._audit(self.tid, itx.user.id, "admin_delete_tournament", "DELETE")
             await itx.response.send_message("賽事已刪除。", ephemeral=True)
 
 # ---------- setup ----------
@@ -49,8 +49,22 @@ class SwissExtras(commands.Cog):
         self._lock = asyncio.Lock()
 
     # ---------- common helpers ----------
+    def _swiss(self):
+        """已建好長連線的 SwissAll；尚未載入 / 尚未 setup_db 時回 None。"""
+        swiss = self.bot.get_cog("SwissAll")
+        if swiss is not None and getattr(swiss, "_conn", None) is not None:
+            return swiss
+        return None
+
     def db(self):
-        return aiosqlite.connect(DB_PATH)
+        # 寫入（DML）：借用 SwissAll 的單一寫入連線與鎖；否則退回一次性連線
+        swiss = self._swiss()
+        return swiss.db() if swiss is not None else aiosqlite.connect(DB_PATH)
+
+    def db_read(self):
+        # 純讀取（統計、匯出）：走 SwissAll 的讀取池，不佔寫入鎖
+        swiss = self._swiss()
+        return swiss.db_read() if swiss is not None else aiosqlite.connect(DB_PATH)
 
     async def _send_ephemeral(self, itx: discord.Interaction, content: Optional[str] = None, **kwargs):
         if not itx.response.is_done():
@@ -153,7 +167,7 @@ class SwissExtras(commands.Cog):
 
     # ---------- seasons helpers ----------
     async def seasons_all(self) -> List[dict]:
-        async with self.db() as conn:
+        async with self.db_read() as conn:
             async with conn.execute(
                 "SELECT slug,name,start_ts,end_ts FROM seasons ORDER BY start_ts"
             ) as c:
@@ -164,7 +178,7 @@ class SwissExtras(commands.Cog):
         return out
 
     async def season_by_slug(self, slug: str) -> Optional[dict]:
-        async with self.db() as conn:
+        async with self.db_read() as conn:
             async with conn.execute(
                 "SELECT slug,name,start_ts,end_ts FROM seasons WHERE slug=?",
                 (slug,)
@@ -197,7 +211,7 @@ class SwissExtras(commands.Cog):
 
     # ---------- common lookups ----------
     async def guild_latest_tid(self, guild_id: int) -> Optional[int]:
-        async with self.db() as conn:
+        async with self.db_read() as conn:
             async with conn.execute(
                 "SELECT id FROM tournaments WHERE guild_id=? ORDER BY id DESC LIMIT 1",
                 (guild_id,)
@@ -206,7 +220,7 @@ class SwissExtras(commands.Cog):
                 return r[0] if r else None
 
     async def get_organizer(self, tid: int) -> Optional[int]:
-        async with self.db() as conn:
+        async with self.db_read() as conn:
             async with conn.execute("SELECT organizer_id FROM tournaments WHERE id=?", (tid,)) as cur:
                 r = await cur.fetchone()
                 return r[0] if r else None
@@ -226,7 +240,7 @@ class SwissExtras(commands.Cog):
 
     async def export_tournament_json(self, tid: int) -> Optional[discord.File]:
         dump: Dict[str, Any] = {}
-        async with self.db() as conn:
+        async with self.db_read() as conn:
             async with conn.execute(
                 "SELECT id,guild_id,name,status,organizer_id,created_at,finished_at,archived "
                 "FROM tournaments WHERE id=?",
@@ -272,7 +286,7 @@ class SwissExtras(commands.Cog):
 
     # ---------- user stats & history ----------
     async def _user_pids(self, guild_id: int, user_id: int) -> List[int]:
-        async with self.db() as conn:
+        async with self.db_read() as conn:
             async with conn.execute(
                 "SELECT p.id FROM players p JOIN tournaments t ON p.tournament_id=t.id "
                 "WHERE t.guild_id=? AND p.user_id=?",
@@ -281,7 +295,7 @@ class SwissExtras(commands.Cog):
                 return [r[0] for r in await cur.fetchall()]
 
     async def compute_user_aggregate(self, guild_id: int, user_id: int):
-        async with self.db() as conn:
+        async with self.db_read() as conn:
             async with conn.execute(
                 "SELECT p.id FROM players p JOIN tournaments t ON p.tournament_id=t.id WHERE t.guild_id=? AND p.user_id=?",
                 (guild_id, user_id)
@@ -308,7 +322,7 @@ class SwissExtras(commands.Cog):
         return {"played": played, "wins": wins, "losses": losses, "winrate": round(wr, 4)}
 
     async def fetch_user_recent_matches(self, guild_id: int, user_id: int, limit: int = 20):
-        async with self.db() as conn:
+        async with self.db_read() as conn:
             async with conn.execute(
                 "SELECT p.id FROM players p JOIN tournaments t ON p.tournament_id=t.id "
                 "WHERE t.guild_id=? AND p.user_id=?", (guild_id, user_id)
@@ -375,7 +389,7 @@ class SwissExtras(commands.Cog):
         results = []
 
         # 取今天建立的賽事
-        async with self.db() as conn:
+        async with self.db_read() as conn:
             async with conn.execute(
                 "SELECT id,name,status FROM tournaments "
                 "WHERE guild_id=? AND created_at BETWEEN ? AND ? ORDER BY id DESC",
@@ -388,7 +402,7 @@ class SwissExtras(commands.Cog):
 
         for tid, name, status in tours:
             # 找出「我」在該賽事對應的 players.id 與目前分數
-            async with self.db() as conn:
+            async with self.db_read() as conn:
                 async with conn.execute(
                     "SELECT id, score FROM players WHERE tournament_id=? AND user_id=?",
                     (tid, user_id)
@@ -399,7 +413,7 @@ class SwissExtras(commands.Cog):
             my_pid, my_score = me
 
             # 計算今天在該賽事的 W/L（排除 BYE）
-            async with self.db() as conn:
+            async with self.db_read() as conn:
                 async with conn.execute(
                     "SELECT p1_id,p2_id,result,winner_player_id "
                     "FROM matches WHERE tournament_id=? AND (p1_id=? OR p2_id=?)",
@@ -416,7 +430,7 @@ class SwissExtras(commands.Cog):
                     l += 1
 
             # 預設參賽人數
-            async with self.db() as conn:
+            async with self.db_read() as conn:
                 async with conn.execute(
                     "SELECT COUNT(1) FROM players WHERE tournament_id=?",
                     (tid,)
@@ -443,7 +457,7 @@ class SwissExtras(commands.Cog):
 
             # 若沒 SwissAll 或取不到，fallback：分數降序 + 名字排序
             if my_rank is None:
-                async with self.db() as conn:
+                async with self.db_read() as conn:
                     async with conn.execute(
                         "SELECT id, display_name, score FROM players WHERE tournament_id=? "
                         "ORDER BY score DESC, display_name COLLATE NOCASE ASC",
@@ -484,7 +498,7 @@ class SwissExtras(commands.Cog):
         start_ts, end_ts = self._season_bounds(season)
 
         # tournaments in range
-        async with self.db() as conn:
+        async with self.db_read() as conn:
             async with conn.execute(
                 "SELECT id FROM tournaments WHERE guild_id=? AND created_at BETWEEN ? AND ?",
                 (guild_id, start_ts, end_ts)
@@ -494,7 +508,7 @@ class SwissExtras(commands.Cog):
             return {"matches": 0, "wins": 0, "losses": 0, "wr": 0.0, "avg_wr": 0.0}
 
         rows = []
-        async with self.db() as conn:
+        async with self.db_read() as conn:
             my_pids: set[int] = set()
             if scope == "self" and user_id is not None:
                 async with conn.execute(
@@ -834,15 +848,18 @@ class SwissExtras(commands.Cog):
             try: tid = int(str(self.tid_input.value).strip())
             except Exception: return await itx.response.send_message("格式錯誤，請輸入數字 ID。", ephemeral=True)
             if not itx.user.guild_permissions.manage_guild: return await itx.response.send_message("需要管理權限。", ephemeral=True)
+            # 回覆留到離開 async with 之後，不在持有寫入鎖時等 Discord
             async with self.cog.db() as conn:
                 async with conn.execute("SELECT 1 FROM tournaments WHERE id=?", (tid,)) as cur:
-                    if not await cur.fetchone():
-                        return await self.cog._send_ephemeral(itx, "找不到該賽事。")
-                await conn.execute("DELETE FROM matches WHERE tournament_id=?", (tid,))
-                await conn.execute("DELETE FROM rounds WHERE tournament_id=?", (tid,))
-                await conn.execute("DELETE FROM players WHERE tournament_id=?", (tid,))
-                await conn.execute("DELETE FROM tournaments WHERE id=?", (tid,))
-                await conn.commit()
+                    found = await cur.fetchone() is not None
+                if found:
+                    await conn.execute("DELETE FROM matches WHERE tournament_id=?", (tid,))
+                    await conn.execute("DELETE FROM rounds WHERE tournament_id=?", (tid,))
+                    await conn.execute("DELETE FROM players WHERE tournament_id=?", (tid,))
+                    await conn.execute("DELETE FROM tournaments WHERE id=?", (tid,))
+                    await conn.commit()
+            if not found:
+                return await self.cog._send_ephemeral(itx, "找不到該賽事。")
             await self.cog._send_ephemeral(itx, f"✅ 已刪除賽事 ID={tid} 及其所有相關資料。")
 
     class ArchivePanelView(discord.ui.View):
@@ -929,7 +946,7 @@ class SwissExtras(commands.Cog):
             async def _on_pick(sel_itx: discord.Interaction):
                 tid_chosen = int(select.values[0])
                 # 讀名稱作為標題
-                async with self.cog.db() as conn:
+                async with self.cog.db_read() as conn:
                     async with conn.execute("SELECT name FROM tournaments WHERE id=?", (tid_chosen,)) as c:
                         r = await c.fetchone()
                         tname = r[0] if r else f"ID={tid_chosen}"
@@ -957,7 +974,7 @@ class SwissExtras(commands.Cog):
                 return await itx.response.send_message("日期格式錯誤，請用 YYYY-MM-DD。", ephemeral=True)
 
             # 撈該日該伺服器的所有賽事
-            async with self.cog.db() as conn:
+            async with self.cog.db_read() as conn:
                 async with conn.execute(
                     "SELECT id, name, created_at FROM tournaments "
                     "WHERE guild_id=? AND created_at BETWEEN ? AND ? "
@@ -1061,7 +1078,7 @@ class SwissExtras(commands.Cog):
         回傳 rows：包含內部相容欄位 pid/name，也包含顯示用 Pos/Player。
         """
         # 1) 基礎資料
-        async with self.db() as conn:
+        async with self.db_read() as conn:
             async with conn.execute(
                 "SELECT id,user_id,display_name,active FROM players WHERE tournament_id=?",
                 (tid,)
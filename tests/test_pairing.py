@@ -0,0 +1,34 @@
+import pytest
+
+pytest.importorskip("discord")
+pytest.importorskip("aiosqlite")
+
+from cogs.swiss import PlayerRow, SwissAll
+
+
+def _p(pid: int, score: float) -> PlayerRow:
+    return PlayerRow(pid, 1, 100 + pid, f"p{pid}", 1, score)
+
+
+def _ids(pairs):
+    return {(a.id, b.id if b else None) for a, b in pairs}
+
+
+def test_backtracks_to_avoid_forced_rematch():
+    # A=9 B=6 C=3 D=0，C/D 已對過：貪婪會配出 A–B、C–D，應回溯成 A–C、B–D
+    a, b, c, d = _p(1, 9), _p(2, 6), _p(3, 3), _p(4, 0)
+    pairs = SwissAll._pair_by_score([a, b, c, d], {3: {4}, 4: {3}}, set())
+    assert _ids(pairs) == {(1, 3), (2, 4)}
+
+
+def test_allows_rematch_only_when_unavoidable():
+    players = [_p(i, 0) for i in range(1, 5)]
+    history = {i: {j for j in range(1, 5) if j != i} for i in range(1, 5)}
+    pairs = SwissAll._pair_by_score(players, history, set())
+    assert sorted(x for pair in _ids(pairs) for x in pair) == [1, 2, 3, 4]
+
+
+def test_bye_goes_to_lowest_without_previous_bye():
+    a, b, c = _p(1, 6), _p(2, 3), _p(3, 0)
+    pairs = SwissAll._pair_by_score([a, b, c], {}, {3})
+    assert (2, None) in _ids(pairs)